@@ -9,3 +9,35 @@ MODELS_DIR = ROOT_DIR / "src" / "models" / "demand_predictions"
 
 # For testing purposes
 MODELS_DIR = Path(os.getenv('TEST_MODELS_DIR', str(MODELS_DIR)))
+
+# Consolidated forecast artifact written by the training pipeline; when it does
+# not exist the API falls back to the per-context CSV files in MODELS_DIR
+FORECAST_ARTIFACT_DIR = Path(os.getenv('FORECAST_ARTIFACT_DIR', str(ROOT_DIR / "src" / "models" / "forecast_artifact")))
+
+# Forecast response cache: maximum number of entries and seconds an entry stays valid
+FORECAST_CACHE_SIZE = int(os.getenv('FORECAST_CACHE_SIZE', '10000'))
+FORECAST_CACHE_TTL = float(os.getenv('FORECAST_CACHE_TTL', '300'))
+
+# Worker threads the async routes may use for forecast file I/O
+FORECAST_IO_THREADS = int(os.getenv('FORECAST_IO_THREADS', '2'))
+
+# Logging: minimum level and "json" (one object per line) or "text" output
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+
+# Forecasts past the end of the history come from the compact models of the
+# artifact. "on_demand" forecasts a context when it is asked for and caches the
+# response; "batch" forecasts every context up to FORECAST_MAX_STEPS days when
+# the forecasts are loaded, trading memory and load time for lookups
+FORECAST_MODE = os.getenv('FORECAST_MODE', 'on_demand')
+# Longest horizon, in days, the API forecasts
+FORECAST_MAX_STEPS = int(os.getenv('FORECAST_MAX_STEPS', '365'))
+
+# Most contexts a catalog search may return
+CATALOG_SEARCH_MAX_RESULTS = int(os.getenv('CATALOG_SEARCH_MAX_RESULTS', '100'))
+
+# Tables derived from the forecast artifact, built once and memory-mapped by
+# every worker process; next to the artifact when unset
+FORECAST_SHARED_DIR = Path(os.environ['FORECAST_SHARED_DIR']) if os.getenv('FORECAST_SHARED_DIR') else None
+# Worker processes when the API is started with `python -m src.app.main`
+API_WORKERS = int(os.getenv('API_WORKERS', '1'))
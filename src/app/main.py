@@ -1,16 +1,42 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import pandas as pd
+import logging
 import os
 from pathlib import Path
 from .routes.demand import router as demand_router
+from .services.forecast_store import forecast_store
+from .services.metrics import registry, MetricsMiddleware, CONTENT_TYPE
+from .config import MODELS_DIR, FORECAST_ARTIFACT_DIR, LOG_LEVEL, LOG_FORMAT, API_WORKERS
+from .log import configure_logging
+
+configure_logging(__package__, LOG_LEVEL, LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("Starting API", extra={
+        'cwd': os.getcwd(),
+        'models_dir': str(MODELS_DIR),
+        'models_dir_exists': MODELS_DIR.exists(),
+        'forecast_artifact_dir': str(FORECAST_ARTIFACT_DIR),
+        'forecast_artifact_exists': FORECAST_ARTIFACT_DIR.exists(),
+    })
+    # Load every forecast once at startup instead of on the first request
+    await forecast_store.arefresh()
+    yield
+
 
 app = FastAPI(
     title="Supply Chain Optimization API",
     description="API for supply chain optimization with demand forecasting",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -22,6 +48,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request counts and latencies, exposed on /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(demand_router)
 
@@ -42,6 +71,13 @@ class DemandForecastResponse(BaseModel):
 async def root():
     return {"message": "Welcome to Supply Chain Optimization API"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Service metrics in the Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Workers are separate processes, so the app is passed by import path; they
+    # share the memory-mapped forecast tables (see services/shared_tables.py)
+    uvicorn.run("src.app.main:app", host="0.0.0.0", port=8000, workers=API_WORKERS)
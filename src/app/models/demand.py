@@ -1,4 +1,9 @@
-from pydantic import BaseModel
+from datetime import date
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+
+# Upper bound on the number of items accepted by the batch forecast endpoint
+MAX_BATCH_SIZE = 1000
 
 class DemandForecastRequest(BaseModel):
     year: int
@@ -10,3 +15,68 @@ class DemandForecastResponse(BaseModel):
     forecast_quantity: float
     confidence_interval_lower: float
     confidence_interval_upper: float
+
+class DemandForecastBatchRequest(BaseModel):
+    requests: List[DemandForecastRequest] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class DemandForecastBatchItem(BaseModel):
+    status_code: int
+    forecast: Optional[DemandForecastResponse] = None
+    detail: Optional[str] = None
+
+class DemandForecastBatchResponse(BaseModel):
+    results: List[DemandForecastBatchItem]
+
+class DemandHorizonRequest(BaseModel):
+    country: str
+    product_description: str
+    # Days to forecast past the history; the horizon of the trained models when omitted
+    steps: Optional[int] = None
+
+class DemandHorizonPoint(BaseModel):
+    date: date
+    forecast_quantity: float
+    confidence_interval_lower: float
+    confidence_interval_upper: float
+
+class DemandHorizonResponse(BaseModel):
+    country: str
+    product_description: str
+    model: str
+    forecasts: List[DemandHorizonPoint]
+
+class DemandAggregateRequest(BaseModel):
+    # Countries and products to include; every one when omitted
+    countries: Optional[List[str]] = None
+    products: Optional[List[str]] = None
+    # First and last day included; unbounded when omitted
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    group_by: List[Literal["country", "product", "month"]] = []
+    # "independent" adds interval half-widths in quadrature, "additive" sums the bounds
+    interval: Literal["independent", "additive"] = "independent"
+
+class DemandAggregate(BaseModel):
+    country: Optional[str] = None
+    product: Optional[str] = None
+    month: Optional[str] = None
+    forecast_quantity: float
+    confidence_interval_lower: float
+    confidence_interval_upper: float
+    days: int
+    contexts: int
+
+class DemandAggregateResponse(BaseModel):
+    results: List[DemandAggregate]
+    # Last day of the stored forecasts; later days of the range are not included
+    forecasts_end: Optional[date] = None
+
+class CatalogItem(BaseModel):
+    # Products of the legacy per-context files are truncated to their first characters
+    country: Optional[str] = None
+    product: Optional[str] = None
+    context: str
+
+class CatalogSearchResponse(BaseModel):
+    query: str
+    results: List[CatalogItem]
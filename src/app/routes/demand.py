@@ -1,119 +1,128 @@
-from fastapi import APIRouter, HTTPException
+import logging
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, validator
 from typing import List, Optional
-import pandas as pd
-from pathlib import Path
-from ..models.demand import DemandForecastRequest, DemandForecastResponse
-from ..config import MODELS_DIR
-import os
+from collections import defaultdict
+from ..models.demand import (
+    DemandForecastRequest,
+    DemandForecastResponse,
+    DemandForecastBatchRequest,
+    DemandForecastBatchItem,
+    DemandForecastBatchResponse,
+    DemandHorizonRequest,
+    DemandHorizonPoint,
+    DemandHorizonResponse,
+    DemandAggregateRequest,
+    DemandAggregate,
+    DemandAggregateResponse,
+    CatalogItem,
+    CatalogSearchResponse,
+)
+from ..config import FORECAST_CACHE_SIZE, FORECAST_CACHE_TTL, CATALOG_SEARCH_MAX_RESULTS
+from ..services.forecast_store import forecast_store, context_key
+from ..services.cache import ResponseCache
+from ..services.metrics import registry, TimedRoute
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/v1", route_class=TimedRoute)
+
+# Responses and 404 misses of the single forecast route, keyed by store version
+forecast_cache = ResponseCache(maxsize=FORECAST_CACHE_SIZE, ttl=FORECAST_CACHE_TTL)
+
+registry.callback("forecast_cache_hits_total", "Forecast cache hits.", lambda: forecast_cache.hits, kind="counter")
+registry.callback("forecast_cache_misses_total", "Forecast cache misses.", lambda: forecast_cache.misses, kind="counter")
+registry.callback("forecast_cache_hit_ratio", "Share of forecast lookups served from the cache.",
+                  lambda: forecast_cache.stats()["hit_rate"])
+registry.callback("forecast_cache_entries", "Entries in the forecast cache.", lambda: len(forecast_cache))
+# Horizon forecasts by (country, product, steps), keyed by store version
+horizon_cache = ResponseCache(maxsize=FORECAST_CACHE_SIZE, ttl=FORECAST_CACHE_TTL)
+
+registry.callback("forecast_horizon_cache_hits_total", "Horizon forecast cache hits.",
+                  lambda: horizon_cache.hits, kind="counter")
+registry.callback("forecast_horizon_cache_misses_total", "Horizon forecast cache misses.",
+                  lambda: horizon_cache.misses, kind="counter")
+registry.callback("forecast_store_rows", "Monthly forecasts held by the forecast store.", lambda: len(forecast_store))
+
+
+def _check_month(request: DemandForecastRequest):
+    if request.month < 1 or request.month > 12:
+        raise HTTPException(
+            status_code=400,
+            detail="Month must be between 1 and 12"
+        )
+
+
+def _check_context(request: DemandForecastRequest):
+    if not forecast_store.has_context(request.country, request.product_description):
+        detail = f"No forecast model found for country: {request.country} and product: {request.product_description}"
+        suggestions = forecast_store.suggest(request.country, request.product_description)
+        if suggestions:
+            names = ", ".join(entry.product or entry.context for entry in suggestions)
+            detail += f". Did you mean: {names}?"
+        raise HTTPException(status_code=404, detail=detail)
+
+    if not forecast_store.is_valid(request.country, request.product_description):
+        raise HTTPException(
+            status_code=500,
+            detail="Forecast file is missing required columns"
+        )
+
+
+def _get_forecast(request: DemandForecastRequest) -> DemandForecastResponse:
+    # Get the forecast for the requested month
+    forecast = forecast_store.get(request.country, request.product_description, request.year, request.month)
+    if forecast is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No forecast data found for year: {request.year} and month: {request.month}"
+        )
+
+    return DemandForecastResponse(
+        forecast_quantity=forecast.forecast,
+        confidence_interval_lower=forecast.lower_ci,
+        confidence_interval_upper=forecast.upper_ci
+    )
+
+
+def _cached_forecast(request: DemandForecastRequest) -> DemandForecastResponse:
+    forecast_cache.ensure_version(forecast_store.version)
+    key = (request.country, request.product_description, request.year, request.month)
+
+    found, result = forecast_cache.get(key)
+    if not found:
+        try:
+            _check_context(request)
+            result = _get_forecast(request)
+        except HTTPException as e:
+            if e.status_code != 404:
+                raise
+            # Misses are cached too; a fresh exception is raised on every hit
+            result = (e.status_code, e.detail)
+        forecast_cache.set(key, result)
+
+    if isinstance(result, tuple):
+        raise HTTPException(status_code=result[0], detail=result[1])
+    return result
 
-router = APIRouter(prefix="/api/v1")
 
 @router.post("/forecast/demand", response_model=DemandForecastResponse)
 async def get_demand_forecast(request: DemandForecastRequest):
-    print(f"Current working directory: {os.getcwd()}")
-    print(f"MODELS_DIR: {MODELS_DIR}")
-    print(f"File exists: {MODELS_DIR.exists()}")
-    print(f"Request data: {request.model_dump()}")
+    # Checked first so the request fields are not collected when debug is off
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Forecast request", extra={
+            **request.model_dump(),
+            'context': context_key(request.country, request.product_description),
+        })
     try:
         # Validate input data
-        if request.month < 1 or request.month > 12:
-            raise HTTPException(
-                status_code=400,
-                detail="Month must be between 1 and 12"
-            )
-        
-        # Convert country and product description to match file naming convention
-        country = request.country.upper()
-        product_description = request.product_description.upper().replace(" ", "_")
-        print(f"Converted country: {country}")
-        print(f"Converted product: {product_description}")
-        
-        # Construct the expected filename
-        filename = f"{country}_{product_description}_forecast.csv"
-        file_path = MODELS_DIR / filename
-        print(f"Expected file path: {file_path}")
-        print(f"File exists: {file_path.is_file()}")
-        
-        # Ensure the directory exists
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        if not file_path.is_file():
-            raise HTTPException(
-                status_code=404,
-                detail=f"No forecast model found for country: {request.country} and product: {request.product_description}"
-            )
-        
-        try:
-            # Read the CSV file
-            df = pd.read_csv(file_path)
-            print(f"Successfully read CSV file with columns: {list(df.columns)}")
-            
-            # Map the column names from the CSV to our expected names
-            column_map = {
-                'Date': 'Date',
-                'Forecasted_Quantity': 'Forecast',
-                'Lower_Bound': 'Lower CI',
-                'Upper_Bound': 'Upper CI',
-                'Actual': 'Actual'
-            }
-            
-            # Rename columns to match our expected names
-            df = df.rename(columns=column_map)
-            
-            # Extract year and month from Date column if it exists
-            if 'Date' in df.columns:
-                df['Year'] = pd.to_datetime(df['Date']).dt.year
-                df['Month'] = pd.to_datetime(df['Date']).dt.month
-            
-            # Get the forecast for the requested month
-            forecast_data = df[(df['Year'] == request.year) & (df['Month'] == request.month)]
-            if forecast_data.empty:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"No forecast data found for year: {request.year} and month: {request.month}"
-                )
-                
-            # Prepare the response
-            response_data = {
-                "year": request.year,
-                "month": request.month,
-                "country": request.country,
-                "product_description": request.product_description,
-                "forecast": float(forecast_data['Forecast'].iloc[0]),
-                "lower_ci": float(forecast_data['Lower CI'].iloc[0]),
-                "upper_ci": float(forecast_data['Upper CI'].iloc[0])
-            }
-            return DemandForecastResponse(
-                forecast_quantity=response_data['forecast'],
-                confidence_interval_lower=response_data['lower_ci'],
-                confidence_interval_upper=response_data['upper_ci']
-            )
-            
-        except Exception as e:
-            print(f"Error reading or processing CSV file: {str(e)}")
-            raise HTTPException(
-                status_code=500,
-                detail="Forecast file is missing required columns"
-            )
-        
-        # Filter by year and month
-        filtered_df = df[(df['Year'] == request.year) & (df['Month'] == request.month)]
-        
-        if filtered_df.empty:
-            raise HTTPException(
-                status_code=404,
-                detail=f"No forecast available for year: {request.year} and month: {request.month}"
-            )
-            
-        # Get the forecast values
-        forecast = filtered_df.iloc[0]
-        return DemandForecastResponse(
-            forecast_quantity=forecast['Forecast'],
-            confidence_interval_lower=forecast['Lower CI'],
-            confidence_interval_upper=forecast['Upper CI']
-        )
-        
+        _check_month(request)
+
+        # Forecasts are served from memory; any reload happens off the event loop
+        await forecast_store.arefresh()
+
+        return _cached_forecast(request)
+
     except HTTPException:
         raise
     except Exception as e:
@@ -121,3 +130,167 @@ async def get_demand_forecast(request: DemandForecastRequest):
             status_code=500,
             detail=f"Internal server error: {str(e)}"
         )
+
+
+@router.post("/forecast/demand/batch", response_model=DemandForecastBatchResponse)
+async def get_demand_forecast_batch(batch: DemandForecastBatchRequest):
+    """
+    Resolve many forecast requests at once.
+
+    Items are grouped by forecast file so each context is checked once, and the
+    results come back in request order. A failing item gets its own status code
+    and detail instead of failing the whole batch.
+    """
+    await forecast_store.arefresh()
+
+    groups = defaultdict(list)
+    for position, request in enumerate(batch.requests):
+        groups[context_key(request.country, request.product_description)].append(position)
+
+    results: List[Optional[DemandForecastBatchItem]] = [None] * len(batch.requests)
+    for positions in groups.values():
+        # The context is checked once, on the first item with a valid month
+        context_error = None
+        context_checked = False
+        for position in positions:
+            request = batch.requests[position]
+            try:
+                # Month first, in the order of the single route, so an item gets the same status
+                _check_month(request)
+                if not context_checked:
+                    context_checked = True
+                    try:
+                        _check_context(request)
+                    except HTTPException as e:
+                        context_error = e
+                if context_error is not None:
+                    raise HTTPException(status_code=context_error.status_code, detail=context_error.detail)
+                forecast = _get_forecast(request)
+                results[position] = DemandForecastBatchItem(status_code=200, forecast=forecast)
+            except HTTPException as e:
+                results[position] = DemandForecastBatchItem(status_code=e.status_code, detail=e.detail)
+            except Exception as e:
+                results[position] = DemandForecastBatchItem(
+                    status_code=500,
+                    detail=f"Internal server error: {str(e)}"
+                )
+
+    return DemandForecastBatchResponse(results=results)
+
+
+def _horizon_forecast(request: DemandHorizonRequest, steps: int) -> DemandHorizonResponse:
+    horizon = forecast_store.forecast_horizon(request.country, request.product_description, steps)
+    if horizon is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No forecasting model stored for country: {request.country} and product: "
+                   f"{request.product_description}"
+        )
+
+    forecasts = [
+        DemandHorizonPoint(
+            date=day,
+            forecast_quantity=forecast,
+            confidence_interval_lower=lower,
+            confidence_interval_upper=upper
+        )
+        for day, forecast, lower, upper in zip(
+            horizon.dates.tolist(), horizon.forecast.tolist(), horizon.lower.tolist(), horizon.upper.tolist()
+        )
+    ]
+    return DemandHorizonResponse(
+        country=request.country,
+        product_description=request.product_description,
+        model=forecast_store.model_kind(request.country, request.product_description),
+        forecasts=forecasts
+    )
+
+
+@router.post("/forecast/demand/horizon", response_model=DemandHorizonResponse)
+async def get_demand_forecast_horizon(request: DemandHorizonRequest):
+    """
+    Daily forecasts of the days following a context's history.
+
+    Forecast by the context's compact model, up to FORECAST_MAX_STEPS days;
+    responses are cached until the forecasts are reloaded.
+    """
+    await forecast_store.arefresh()
+
+    steps = request.steps if request.steps is not None else forecast_store.horizon
+    if steps < 1 or steps > forecast_store.max_steps:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Steps must be between 1 and {forecast_store.max_steps}"
+        )
+    _check_context(request)
+
+    horizon_cache.ensure_version(forecast_store.version)
+    key = (request.country, request.product_description, steps)
+    found, result = horizon_cache.get(key)
+    if not found:
+        result = _horizon_forecast(request, steps)
+        horizon_cache.set(key, result)
+    return result
+
+
+@router.post("/forecast/demand/aggregate", response_model=DemandAggregateResponse)
+async def get_demand_forecast_aggregate(request: DemandAggregateRequest):
+    """
+    Total forecasts and confidence bounds across countries, products and days.
+
+    Served from the monthly roll-ups of the forecast table built when the
+    forecasts are loaded, so no forecast file is read per query. Only the
+    stored forecasts are aggregated, whatever the forecast mode;
+    `forecasts_end` tells where they stop.
+    """
+    await forecast_store.arefresh()
+
+    if request.start_date and request.end_date and request.start_date > request.end_date:
+        raise HTTPException(
+            status_code=400,
+            detail="start_date must not be after end_date"
+        )
+
+    results = forecast_store.aggregate(
+        countries=request.countries,
+        products=request.products,
+        start=request.start_date,
+        end=request.end_date,
+        group_by=request.group_by,
+        interval=request.interval,
+    )
+    if results is None:
+        # Legacy per-context files may hold day-over-day differences, which cannot be summed
+        raise HTTPException(
+            status_code=503,
+            detail="Aggregate queries need the consolidated forecast artifact"
+        )
+    return DemandAggregateResponse(
+        results=[DemandAggregate(**result) for result in results],
+        forecasts_end=forecast_store.aggregate_end,
+    )
+
+
+@router.get("/catalog/search", response_model=CatalogSearchResponse)
+async def search_catalog(q: str = "", country: Optional[str] = None,
+                         limit: int = Query(10, ge=1, le=CATALOG_SEARCH_MAX_RESULTS)):
+    """
+    Contexts with forecasts whose product name, or any word of it onwards,
+    starts with `q`, ignoring case and punctuation; for autocomplete.
+
+    Names starting with `q` come first. Served from the in-memory catalog of
+    the loaded forecasts.
+    """
+    await forecast_store.arefresh()
+
+    results = forecast_store.search(q, country, limit)
+    return CatalogSearchResponse(
+        query=q,
+        results=[CatalogItem(country=e.country, product=e.product, context=e.context) for e in results]
+    )
+
+
+@router.get("/forecast/cache/stats")
+async def get_forecast_cache_stats():
+    """Hit/miss counters and size of the forecast response cache."""
+    return forecast_cache.stats()
@@ -0,0 +1,140 @@
+import bisect
+import difflib
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+_WORDS = re.compile(r"[A-Z0-9]+")
+
+# Sorts after every character of a normalized name, to bound prefix ranges
+_PREFIX_END = "~"
+
+
+def search_key(text: str) -> str:
+    """Upper-cased words of a name, ignoring punctuation and spacing."""
+    return " ".join(_WORDS.findall(text.upper()))
+
+
+@lru_cache(maxsize=8)
+def _country_keys(countries: Tuple[str, ...]) -> List[Tuple[str, str]]:
+    """(normalized name followed by a space, country), longest first."""
+    return sorted(((search_key(c) + " ", c) for c in countries), key=lambda item: -len(item[0]))
+
+
+def split_context_name(name: str, countries: Iterable[str]) -> Tuple[str, str]:
+    """
+    (country, product) of a combined "COUNTRY_PRODUCT" name: the longest of
+    `countries` the name starts with, else its first word.
+    """
+    words = search_key(name) + " "
+    for key, country in _country_keys(tuple(countries)):
+        if words.startswith(key):
+            return country, words[len(key):-1]
+    country, product = words.split(" ", 1)
+    return country, product[:-1]
+
+
+class CatalogEntry(NamedTuple):
+    context: str                # key of the context in the forecast store
+    country: Optional[str]      # None when only the combined name of the context is known
+    product: Optional[str]
+
+
+class ContextCatalog:
+    """
+    In-memory catalog of the (country, product) contexts that have forecasts.
+
+    Names are resolved through a dictionary of normalized names, so case,
+    spacing and punctuation do not matter. Products are searched by prefix
+    through a sorted index of every word-aligned suffix of their names, so
+    "DINER" finds "BLUE DINER PLATE"; matches at the start of a name come
+    first. Near misses get fuzzy suggestions.
+    """
+
+    def __init__(self, entries: Iterable[CatalogEntry]):
+        self.entries: List[CatalogEntry] = sorted(entries, key=lambda e: (e.country or "", e.product or e.context))
+        self._by_name: Dict[str, int] = {}
+        self._countries: List[str] = []
+        self._labels: List[str] = []
+        self._products: List[str] = []
+        # Entries of each country; legacy entries are listed under ""
+        self._by_country: Dict[str, List[int]] = {}
+        names, suffixes = [], []
+        for i, entry in enumerate(self.entries):
+            if entry.country is None:
+                label = product = search_key(entry.context)
+                country = ""
+            else:
+                country, product = search_key(entry.country), search_key(entry.product)
+                label = f"{country} {product}"
+            self._by_name.setdefault(label, i)
+            self._countries.append(country)
+            self._labels.append(label)
+            self._products.append(product)
+            self._by_country.setdefault(country, []).append(i)
+
+            words = product.split(" ")
+            names.append((product, i))
+            suffixes.extend((" ".join(words[w:]), i) for w in range(1, len(words)))
+
+        names.sort()
+        suffixes.sort()
+        self._names = [name for name, _ in names]
+        self._name_entries = [i for _, i in names]
+        self._suffixes = [suffix for suffix, _ in suffixes]
+        self._suffix_entries = [i for _, i in suffixes]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def resolve(self, country: str, product: str) -> Optional[str]:
+        """Context key of a (country, product) pair, whatever its case, spacing and punctuation."""
+        i = self._by_name.get(search_key(f"{country} {product}"))
+        return self.entries[i].context if i is not None else None
+
+    @staticmethod
+    def _prefix_range(index: List[str], prefix: str) -> range:
+        return range(bisect.bisect_left(index, prefix), bisect.bisect_left(index, prefix + _PREFIX_END))
+
+    def search(self, query: str, country: Optional[str] = None, limit: int = 10) -> List[CatalogEntry]:
+        """Contexts whose product name, or a word of it onwards, starts with `query`."""
+        prefix = search_key(query)
+        wanted = search_key(country) if country is not None else None
+
+        found, seen = [], set()
+        for index, entries in ((self._names, self._name_entries), (self._suffixes, self._suffix_entries)):
+            for position in self._prefix_range(index, prefix):
+                i = entries[position]
+                if i in seen or (wanted is not None and self._countries[i] != wanted):
+                    continue
+                seen.add(i)
+                found.append(self.entries[i])
+                if len(found) == limit:
+                    return found
+        return found
+
+    def suggest(self, country: str, product: str, limit: int = 3, cutoff: float = 0.6) -> List[CatalogEntry]:
+        """
+        Contexts of `country` whose product name is close to `product`, for
+        names with no exact match. Legacy contexts, which have no separate
+        country, are compared on their whole name.
+        """
+        wanted, name = search_key(country), search_key(product)
+        label = f"{wanted} {name}" if wanted else name
+        by_product, by_label = {}, {}
+        for i in self._by_country.get(wanted, []) if wanted else []:
+            by_product.setdefault(self._products[i], i)
+        for i in self._by_country.get("", []):
+            by_label.setdefault(self._labels[i], i)
+
+        scored = []
+        for query, candidates in ((name, by_product), (label, by_label)):
+            matcher = difflib.SequenceMatcher()
+            matcher.set_seq2(query)
+            for candidate, i in candidates.items():
+                matcher.set_seq1(candidate)
+                if matcher.real_quick_ratio() >= cutoff and matcher.quick_ratio() >= cutoff:
+                    ratio = matcher.ratio()
+                    if ratio >= cutoff:
+                        scored.append((-ratio, candidate, i))
+        return [self.entries[i] for _, _, i in sorted(scored)[:limit]]
@@ -0,0 +1,213 @@
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .catalog import search_key
+
+GROUP_DIMENSIONS = ("country", "product", "month")
+INTERVALS = ("independent", "additive")
+
+# Columns summed per (context, month): forecast, lower bound, upper bound,
+# squared half-width of the interval and number of days
+_FORECAST, _LOWER, _UPPER, _VARIANCE, _DAYS = range(5)
+
+
+class ForecastRollup:
+    """
+    Columnar table of daily forecasts with monthly roll-ups, for aggregate queries.
+
+    Rows hold the context, date, forecast and interval of one day. At build
+    time they are summed per (context, month) into a dense cube, so a query
+    over whole months only adds up cube cells; months cut by the query's date
+    range are summed from their own rows.
+
+    Intervals of an aggregate are combined either as if the errors of the
+    summed forecasts were independent (the half-widths add up in quadrature),
+    or additively, as if they were perfectly correlated, which gives the
+    widest interval.
+
+    The arrays behind a roll-up come from `build_tables`, and can be saved and
+    memory-mapped to share one roll-up between processes (see `from_tables`).
+    """
+
+    def __init__(self, countries: Sequence[str], products: Sequence[str], row_context: np.ndarray,
+                 dates: np.ndarray, values: np.ndarray):
+        """
+        Args:
+            countries, products: Country and product of each context
+            row_context: Context of each row
+            dates: datetime64[D] date of each row
+            values: rows x (forecast, lower, upper)
+        """
+        self._set_tables(countries, products, self.build_tables(len(countries), row_context, dates, values))
+
+    @classmethod
+    def from_tables(cls, countries: Sequence[str], products: Sequence[str],
+                    tables: Dict[str, np.ndarray]) -> "ForecastRollup":
+        """Roll-up over arrays made by `build_tables`, used as they are."""
+        rollup = cls.__new__(cls)
+        rollup._set_tables(countries, products, tables)
+        return rollup
+
+    def _set_tables(self, countries, products, tables):
+        self.countries = list(countries)
+        self.products = list(products)
+
+        self._country_keys, self._country_codes = np.unique(
+            [search_key(c) for c in self.countries], return_inverse=True
+        )
+        self._product_keys, self._product_codes = np.unique(
+            [search_key(p) for p in self.products], return_inverse=True
+        )
+        self._context_countries = self._country_keys[self._country_codes]
+        self._context_products = self._product_keys[self._product_codes]
+
+        self._monthly = tables['monthly']
+        self.first_month = tables['first_month'][()]
+        self.months = self._monthly.shape[1]
+        self._dates = tables['dates']
+        # Dates are sorted, so the last one ends the forecasts
+        self.last_day = self._dates[-1] if len(self._dates) else None
+        self._row_context = tables['row_context']
+        self._columns = tables['columns']
+
+    @staticmethod
+    def build_tables(contexts: int, row_context: np.ndarray, dates: np.ndarray,
+                     values: np.ndarray) -> Dict[str, np.ndarray]:
+        """Monthly cube and date-sorted rows of a roll-up, see __init__ for the arguments."""
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        values = np.asarray(values, dtype=np.float64)
+        months = dates.astype('datetime64[M]')
+        first_month = months.min() if len(months) else np.datetime64('1970-01', 'M')
+        n_months = int((months.max() - first_month).astype(int)) + 1 if len(months) else 0
+        month_index = (months - first_month).astype(np.int64)
+
+        columns = np.empty((len(values), 5))
+        columns[:, :3] = values[:, :3]
+        columns[:, _VARIANCE] = ((values[:, 2] - values[:, 1]) / 2) ** 2
+        columns[:, _DAYS] = 1.0
+
+        row_context = np.asarray(row_context, dtype=np.int64)
+        cells = row_context * n_months + month_index
+        monthly = np.stack([
+            np.bincount(cells, weights=columns[:, k], minlength=contexts * n_months)
+            for k in range(5)
+        ], axis=-1).reshape(contexts, n_months, 5)
+
+        # Rows sorted by date, so the days of a month inside a query's range are a slice
+        order = np.argsort(dates, kind='stable')
+        return {
+            'monthly': monthly,
+            'first_month': np.array(first_month),
+            'dates': dates[order],
+            'row_context': row_context[order],
+            'columns': columns[order],
+        }
+
+    def __len__(self):
+        return len(self._columns)
+
+    def _partial_month(self, month: int, start: np.datetime64, end: np.datetime64) -> np.ndarray:
+        month_start = (self.first_month + month).astype('datetime64[D]')
+        month_end = (self.first_month + month + 1).astype('datetime64[D]') - 1
+        rows = slice(np.searchsorted(self._dates, max(start, month_start)),
+                     np.searchsorted(self._dates, min(end, month_end), side='right'))
+        return np.stack([
+            np.bincount(self._row_context[rows], weights=self._columns[rows, k], minlength=len(self.countries))
+            for k in range(5)
+        ], axis=-1)
+
+    def query(self, countries: Optional[Sequence[str]] = None, products: Optional[Sequence[str]] = None,
+              start=None, end=None, group_by: Sequence[str] = (), interval: str = "independent") -> List[Dict]:
+        """
+        Sum forecasts and their intervals over contexts and days.
+
+        Args:
+            countries, products: Keep only these countries and products (all when None)
+            start, end: First and last day included (unbounded when None)
+            group_by: Any of "country", "product" and "month"; one aggregate per
+                combination, or a single total when empty
+            interval: "independent" or "additive" combination of the intervals
+
+        Returns:
+            list: One dict per non-empty group with its keys, forecast_quantity,
+                confidence_interval_lower/upper, days and contexts
+        """
+        unknown = set(group_by) - set(GROUP_DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown group_by dimension(s): {sorted(unknown)}")
+        if interval not in INTERVALS:
+            raise ValueError(f"Unknown interval: {interval}")
+
+        selected = np.ones(len(self.countries), dtype=bool)
+        if countries is not None:
+            selected &= np.isin(self._context_countries, [search_key(c) for c in countries])
+        if products is not None:
+            selected &= np.isin(self._context_products, [search_key(p) for p in products])
+
+        last_month = self.first_month + self.months - 1
+        start = np.datetime64(start, 'D') if start is not None else self.first_month.astype('datetime64[D]')
+        end = np.datetime64(end, 'D') if end is not None else (last_month + 1).astype('datetime64[D]') - 1
+        first = max(int((start.astype('datetime64[M]') - self.first_month).astype(int)), 0)
+        last = min(int((end.astype('datetime64[M]') - self.first_month).astype(int)), self.months - 1)
+        if first > last or not selected.any():
+            return []
+
+        cube = self._monthly[:, first:last + 1].copy()
+        for month in {first, last}:
+            month_start = (self.first_month + month).astype('datetime64[D]')
+            month_end = (self.first_month + month + 1).astype('datetime64[D]') - 1
+            if start > month_start or end < month_end:
+                cube[:, month - first] = self._partial_month(month, start, end)
+
+        contexts = np.flatnonzero(selected)
+        cube = cube[contexts]
+        if "month" not in group_by:
+            cube = cube.sum(axis=1, keepdims=True)
+
+        by_country, by_product = "country" in group_by, "product" in group_by
+        if by_country and by_product:
+            codes = np.arange(len(contexts))
+        elif by_country:
+            codes = self._country_codes[contexts]
+        elif by_product:
+            codes = self._product_codes[contexts]
+        else:
+            codes = np.zeros(len(contexts), dtype=np.int64)
+        # Sum the contexts of each group as runs of consecutive rows
+        order = np.argsort(codes, kind='stable')
+        codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        # The first context of each group names it
+        representative = contexts[order[starts]]
+        totals = np.add.reduceat(cube[order], starts, axis=0)
+        counts = np.add.reduceat((cube[order][..., _DAYS] > 0).astype(np.int64), starts, axis=0)
+
+        if interval == "independent":
+            half_width = np.sqrt(totals[..., _VARIANCE])
+            lower = totals[..., _FORECAST] - half_width
+            upper = totals[..., _FORECAST] + half_width
+        else:
+            lower, upper = totals[..., _LOWER], totals[..., _UPPER]
+
+        results = []
+        for g, context in enumerate(representative):
+            for m in range(cube.shape[1]):
+                if not totals[g, m, _DAYS]:
+                    continue
+                result = {}
+                if by_country:
+                    result['country'] = self.countries[context]
+                if by_product:
+                    result['product'] = self.products[context]
+                if "month" in group_by:
+                    result['month'] = str(self.first_month + first + m)
+                result.update(
+                    forecast_quantity=float(totals[g, m, _FORECAST]),
+                    confidence_interval_lower=float(lower[g, m]),
+                    confidence_interval_upper=float(upper[g, m]),
+                    days=int(totals[g, m, _DAYS]),
+                    contexts=int(counts[g, m]),
+                )
+                results.append(result)
+        return results
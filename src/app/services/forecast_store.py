@@ -0,0 +1,540 @@
+import asyncio
+import csv
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+import anyio
+import numpy as np
+
+from ..config import (
+    MODELS_DIR,
+    FORECAST_ARTIFACT_DIR,
+    FORECAST_IO_THREADS,
+    FORECAST_MODE,
+    FORECAST_MAX_STEPS,
+    FORECAST_SHARED_DIR,
+)
+from src.supply_chain_optimization.forecast_artifact import (
+    artifact_exists,
+    artifact_signature,
+    read_forecast_artifact,
+)
+from src.supply_chain_optimization.forecast_models import HorizonForecast, forecast_model
+from .forecast_rollup import ForecastRollup
+from .catalog import CatalogEntry, ContextCatalog, split_context_name
+from .shared_tables import open_shared_tables
+
+FORECAST_SUFFIX = "_forecast.csv"
+
+# Column names written by the training pipeline, mapped to the names the API uses
+COLUMN_MAP = {
+    'Forecasted_Quantity': 'Forecast',
+    'Lower_Bound': 'Lower CI',
+    'Upper_Bound': 'Upper CI',
+}
+
+# Legacy per-context files were named after the first characters of the product
+LEGACY_PRODUCT_LENGTH = 10
+
+# Countries of the dataset, to split the "COUNTRY_PRODUCT" names of the legacy
+# files; names starting with none of them take their first word as the country
+LEGACY_COUNTRIES = (
+    "Australia", "Austria", "Bahrain", "Belgium", "Brazil", "Canada", "Channel Islands", "Cyprus",
+    "Czech Republic", "Denmark", "EIRE", "European Community", "Finland", "France", "Germany", "Greece",
+    "Hong Kong", "Iceland", "Israel", "Italy", "Japan", "Lebanon", "Lithuania", "Malta", "Netherlands",
+    "Norway", "Poland", "Portugal", "RSA", "Saudi Arabia", "Singapore", "Spain", "Sweden", "Switzerland",
+    "USA", "United Arab Emirates", "United Kingdom", "Unspecified",
+)
+
+FORECAST_MODES = ("on_demand", "batch")
+
+# Horizon of artifacts written before the training pipeline recorded one
+DEFAULT_HORIZON = 30
+
+# Layout of the shared tables; bump it when the tables built from an artifact change
+SHARED_TABLES_LAYOUT = 2
+
+logger = logging.getLogger(__name__)
+
+
+class ForecastPoint(NamedTuple):
+    forecast: float
+    lower_ci: float
+    upper_ci: float
+
+
+def context_key(country: str, product_description: str) -> str:
+    """Normalize a (country, product) pair the way forecast files are named."""
+    return f"{country}_{product_description}".upper().replace(" ", "_")
+
+
+def _parse_year_month(value: str) -> Tuple[int, int]:
+    try:
+        return int(value[:4]), int(value[5:7])
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        return parsed.year, parsed.month
+
+
+def _month_index(contexts: np.ndarray, months: np.ndarray, positions: np.ndarray, n_contexts: int):
+    """
+    Dense (contexts x months) table of the row serving each month, -1 where
+    there is none, and the month of its first column counted from 1970-01.
+    """
+    first_month = int(months.min()) if len(months) else 0
+    span = int(months.max()) - first_month + 1 if len(months) else 0
+    table = np.full((n_contexts, span), -1, dtype=np.int64)
+    table[contexts, months - first_month] = positions
+    return table, first_month
+
+
+class _Snapshot(NamedTuple):
+    """Everything a lookup needs, swapped in as a whole on reload."""
+    version: str
+    values: np.ndarray  # rows x (forecast, lower, upper, ...)
+    # Context name -> row of `month_rows`
+    context_ids: Dict[str, int]
+    # contexts x months: row of `values` serving each month, -1 where there is none
+    month_rows: np.ndarray
+    # Month of the first column of `month_rows`, counted from 1970-01
+    first_month: int
+    aliases: Dict[str, str]
+    invalid: Set[str]
+    # Compact model of each context able to forecast past its history
+    models: Dict[str, dict]
+    horizon: int
+    # Forecasts of every model computed at load time, in batch mode
+    batch: Dict[str, HorizonForecast]
+    # Daily forecasts and monthly roll-ups for aggregate queries, artifact only
+    rollup: Optional[ForecastRollup]
+    # Names of the contexts, for normalized lookups and search
+    catalog: ContextCatalog
+
+
+_EMPTY = _Snapshot("empty", np.zeros((0, 3)), {}, np.zeros((0, 0), dtype=np.int64), 0, {}, set(), {},
+                   DEFAULT_HORIZON, {}, None, ContextCatalog([]))
+
+
+class ForecastStore:
+    """
+    In-memory index of every demand forecast.
+
+    Forecasts come from the consolidated artifact written by the training
+    pipeline (see supply_chain_optimization/forecast_artifact.py), or from the
+    legacy per-context CSV files in `models_dir` when no artifact exists.
+    Lookups are a dictionary hit on the context, the upper-cased
+    "COUNTRY_PRODUCT" name, followed by reads of a (contexts x months) table of
+    rows and of the forecast array; only the first forecast of each month is
+    served. The source is checked at most every `refresh_interval` seconds and
+    reloaded when it changed. From async code, use `arefresh` so that disk I/O
+    never runs on the event loop.
+
+    The artifact's arrays are memory-mapped, and so are the tables derived
+    from them (month index, roll-ups and batch forecasts): they are built once
+    per artifact into `shared_dir` (see shared_tables.py), so that every worker
+    process of the API shares a single copy through the page cache.
+
+    Months past the forecasts of the artifact, up to `max_steps` days after the
+    end of a context's history, are forecast by the context's compact model
+    (see supply_chain_optimization/forecast_models.py). In "on_demand" `mode`
+    a model forecasts when asked; in "batch" mode every model forecasts
+    `max_steps` days when the artifact is loaded. Aggregates only cover the
+    stored forecasts, in either mode.
+    """
+
+    def __init__(self, models_dir: Path, artifact_dir: Optional[Path] = None, refresh_interval: float = 5.0,
+                 io_threads: int = 1, mode: str = "on_demand", max_steps: int = 365,
+                 shared_dir: Optional[Path] = None):
+        if mode not in FORECAST_MODES:
+            raise ValueError(f"Unknown forecast mode: {mode}")
+        self.models_dir = Path(models_dir)
+        self.artifact_dir = Path(artifact_dir) if artifact_dir is not None else None
+        # Next to the artifact unless given
+        self.shared_dir = Path(shared_dir) if shared_dir is not None else None
+        self.refresh_interval = refresh_interval
+        self.mode = mode
+        self.max_steps = max_steps
+        self._snapshot = _EMPTY
+        self._signature = None
+        self._loaded = False
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._io_threads = io_threads
+        self._limiter = None
+        self._background = None
+
+    @property
+    def version(self) -> str:
+        return self._snapshot.version
+
+    def _use_artifact(self) -> bool:
+        return self.artifact_dir is not None and artifact_exists(self.artifact_dir)
+
+    def _scan(self):
+        """Return the forecast files and a cheap signature of the directory state."""
+        try:
+            directory_mtime = os.stat(self.models_dir).st_mtime_ns
+            entries = [
+                entry for entry in os.scandir(self.models_dir)
+                if entry.name.endswith(FORECAST_SUFFIX) and entry.is_file()
+            ]
+        except FileNotFoundError:
+            return [], None
+
+        stats = [entry.stat() for entry in entries]
+        signature = (
+            directory_mtime,
+            len(entries),
+            max((st.st_mtime_ns for st in stats), default=0),
+            sum(st.st_size for st in stats),
+        )
+        return entries, signature
+
+    def _load_artifact(self) -> _Snapshot:
+        artifact = read_forecast_artifact(self.artifact_dir)
+
+        context_ids, models, entries = {}, {}, []
+        legacy_names = Counter()
+        aliases = {}
+        for i, context in enumerate(artifact.contexts):
+            key = context_key(context['country'], context['product'])
+            context_ids.setdefault(key, i)
+            entries.append(CatalogEntry(key, context['country'], context['product']))
+            if 'model' in context:
+                models[key] = context['model']
+
+            legacy = context_key(context['country'], context['product'][:LEGACY_PRODUCT_LENGTH])
+            if legacy != key:
+                legacy_names[legacy] += 1
+                aliases[legacy] = key
+
+        # Keep serving the truncated names of the legacy files where they are unambiguous
+        aliases = {
+            legacy: key for legacy, key in aliases.items()
+            if legacy_names[legacy] == 1 and legacy not in context_ids
+        }
+
+        key = f"{artifact.version}-{self.mode}-{SHARED_TABLES_LAYOUT}"
+        if self.mode == "batch":
+            key += f"-{self.max_steps}"
+        tables = self._shared_tables(key, lambda: self._build_tables(artifact))
+        batch = {}
+        if self.mode == "batch":
+            for i, dates, forecasts in zip(tables['batch_contexts'], tables['batch_dates'], tables['batch_values']):
+                context = artifact.contexts[i]
+                batch[context_key(context['country'], context['product'])] = HorizonForecast(
+                    dates, forecasts[:, 0], forecasts[:, 1], forecasts[:, 2]
+                )
+        rollup = ForecastRollup.from_tables(
+            [c['country'] for c in artifact.contexts], [c['product'] for c in artifact.contexts],
+            {name[len("rollup_"):]: array for name, array in tables.items() if name.startswith("rollup_")}
+        )
+        horizon = artifact.horizon or DEFAULT_HORIZON
+        return _Snapshot(artifact.version, artifact.values, context_ids, tables['month_rows'],
+                         int(tables['first_month']), aliases, set(), models, horizon, batch, rollup,
+                         ContextCatalog(entries))
+
+    def _shared_tables(self, key: str, build) -> Dict[str, np.ndarray]:
+        """Tables made by `build`, memory-mapped from `shared_dir` when it is usable."""
+        directory = self.shared_dir
+        if directory is None and self.artifact_dir is not None:
+            directory = self.artifact_dir / "shared"
+        if directory is None:
+            return build()
+        try:
+            return open_shared_tables(directory, key, build)
+        except OSError:
+            # E.g. a read-only artifact directory: every process keeps its own tables
+            logger.warning("Cannot share forecast tables, building them in memory", exc_info=True,
+                           extra={'shared_dir': str(directory)})
+            return build()
+
+    def _build_tables(self, artifact) -> Dict[str, np.ndarray]:
+        """
+        Month index and roll-up tables of the artifact's forecasts, and
+        forecasts of every model in batch mode.
+        """
+        lengths = np.array([c['stop'] - c['start'] for c in artifact.contexts], dtype=np.int64)
+        starts = np.array([c['start'] for c in artifact.contexts], dtype=np.int64)
+        row_context = np.repeat(np.arange(len(lengths)), lengths)
+        months = np.asarray(artifact.dates).astype('datetime64[M]').astype(np.int64)
+
+        # A row is served when it is the first of its month within its context
+        first = np.ones(len(months), dtype=bool)
+        first[1:] = months[1:] != months[:-1]
+        first[starts[lengths > 0]] = True
+        positions = np.flatnonzero(first)
+        month_rows, first_month = _month_index(row_context[positions], months[positions], positions, len(lengths))
+        tables = {'month_rows': month_rows, 'first_month': np.array(first_month)}
+
+        # Only the stored forecasts are rolled up, so that aggregates do not depend on the mode
+        rollup = ForecastRollup.build_tables(len(lengths), row_context, artifact.dates, artifact.values[:, :3])
+        tables.update({f"rollup_{name}": array for name, array in rollup.items()})
+
+        if self.mode == "batch":
+            with_model = [i for i, c in enumerate(artifact.contexts) if 'model' in c]
+            forecasts = [forecast_model(artifact.contexts[i]['model'], self.max_steps) for i in with_model]
+            tables['batch_contexts'] = np.array(with_model, dtype=np.int64)
+            tables['batch_dates'] = np.array([f.dates for f in forecasts], dtype='datetime64[D]').reshape(
+                len(forecasts), self.max_steps)
+            tables['batch_values'] = np.array(
+                [np.column_stack([f.forecast, f.lower, f.upper]) for f in forecasts], dtype=np.float64
+            ).reshape(len(forecasts), self.max_steps, 3)
+        return tables
+
+    @staticmethod
+    def _load_file(path, context, rows, values):
+        """Add the monthly forecasts of one file; return False if it is unusable."""
+        with open(path, newline="") as f:
+            reader = csv.reader(f)
+            header = [COLUMN_MAP.get(name, name) for name in next(reader, [])]
+            try:
+                forecast_col = header.index('Forecast')
+                lower_col = header.index('Lower CI')
+                upper_col = header.index('Upper CI')
+            except ValueError:
+                return False
+
+            if 'Date' in header:
+                date_col = header.index('Date')
+                def year_month(row):
+                    return _parse_year_month(row[date_col])
+            elif 'Year' in header and 'Month' in header:
+                year_col, month_col = header.index('Year'), header.index('Month')
+                def year_month(row):
+                    return int(row[year_col]), int(row[month_col])
+            else:
+                return False
+
+            for row in reader:
+                if not row:
+                    continue
+                key = (context, *year_month(row))
+                if key not in rows:
+                    rows[key] = len(values)
+                    values.append((float(row[forecast_col]), float(row[lower_col]), float(row[upper_col])))
+        return True
+
+    def _build_csv_tables(self, entries, context_ids: Dict[str, int]) -> Dict[str, np.ndarray]:
+        """Forecasts of the legacy files, their month index and which contexts are invalid."""
+        rows: Dict[Tuple[str, int, int], int] = {}
+        values = []
+        invalid = np.zeros(len(context_ids), dtype=bool)
+        for entry in entries:
+            context = entry.name[:-len(FORECAST_SUFFIX)].upper()
+            try:
+                if not self._load_file(entry.path, context, rows, values):
+                    invalid[context_ids[context]] = True
+            except (OSError, ValueError, IndexError):
+                invalid[context_ids[context]] = True
+
+        month_rows, first_month = _month_index(
+            np.array([context_ids[context] for context, _, _ in rows], dtype=np.int64),
+            np.array([(year - 1970) * 12 + month - 1 for _, year, month in rows], dtype=np.int64),
+            np.array(list(rows.values()), dtype=np.int64),
+            len(context_ids),
+        )
+        return {
+            'values': np.array(values, dtype=np.float64).reshape(-1, 3),
+            'month_rows': month_rows,
+            'first_month': np.array(first_month),
+            'invalid': invalid,
+        }
+
+    def _load_csv_files(self, entries, signature) -> _Snapshot:
+        names = sorted({entry.name[:-len(FORECAST_SUFFIX)].upper() for entry in entries})
+        context_ids = {context: i for i, context in enumerate(names)}
+        version = hashlib.sha256(repr(signature).encode()).hexdigest()[:16]
+        # Parsed by the first process only, like the tables of an artifact; the
+        # version follows the directory signature, which tracks the file names
+        tables = self._shared_tables(f"csv-{version}-{SHARED_TABLES_LAYOUT}",
+                                     lambda: self._build_csv_tables(entries, context_ids))
+        invalid = {names[i] for i in np.flatnonzero(tables['invalid'])}
+        # Legacy files only carry the combined name of their context, and a truncated product
+        catalog = ContextCatalog(
+            CatalogEntry(context, *split_context_name(context, LEGACY_COUNTRIES)) for context in names
+        )
+        # Legacy files do not say whether they hold quantities or the differences
+        # some contexts were modelled on, so they are not aggregated
+        return _Snapshot(version, tables['values'], context_ids, tables['month_rows'],
+                         int(tables['first_month']), {}, invalid, {}, DEFAULT_HORIZON, {}, None, catalog)
+
+    def refresh(self, force: bool = False):
+        """Load the forecasts if needed and reload them when their source changed."""
+        now = time.monotonic()
+        if not force and self._loaded and now - self._checked_at < self.refresh_interval:
+            return
+
+        with self._lock:
+            use_artifact = self._use_artifact()
+            if use_artifact:
+                entries, signature = None, ('artifact', artifact_signature(self.artifact_dir))
+            else:
+                entries, signature = self._scan()
+                signature = ('csv', signature)
+            self._checked_at = time.monotonic()
+            if not force and self._loaded and signature == self._signature:
+                return
+
+            if use_artifact:
+                snapshot = self._load_artifact()
+            else:
+                snapshot = self._load_csv_files(entries, signature)
+
+            # Swap in the new snapshot in one step so readers never see a partial load
+            self._snapshot = snapshot
+            self._signature = signature
+            self._loaded = True
+        logger.info("Forecasts reloaded", extra={
+            'version': snapshot.version,
+            'source': signature[0],
+            'contexts': len(snapshot.context_ids),
+            'rows': len(self),
+        })
+
+    async def arefresh(self):
+        """
+        Async-safe `refresh` for use on the event loop.
+
+        Directory scans and reloads run in a bounded worker thread pool. Only the
+        very first load is awaited; afterwards requests keep being served from
+        the current snapshot while a reload runs in the background.
+        """
+        if self._loaded and time.monotonic() - self._checked_at < self.refresh_interval:
+            return
+
+        if self._limiter is None:
+            self._limiter = anyio.CapacityLimiter(self._io_threads)
+
+        if not self._loaded:
+            await anyio.to_thread.run_sync(self.refresh, limiter=self._limiter)
+        elif self._background is None or self._background.done():
+            self._background = asyncio.ensure_future(self._refresh_in_background())
+
+    async def _refresh_in_background(self):
+        try:
+            await anyio.to_thread.run_sync(self.refresh, limiter=self._limiter)
+        except Exception:
+            # Keep serving the current snapshot; the next check retries
+            self._checked_at = time.monotonic()
+            logger.exception("Error reloading forecasts", extra={'version': self.version})
+
+    def resolve(self, country: str, product_description: str) -> Optional[str]:
+        """
+        Return the context name serving a (country, product) pair, if any.
+
+        Exact names come first, then the truncated names of the legacy files,
+        then names differing only in case, spacing or punctuation.
+        """
+        snapshot = self._snapshot
+        key = context_key(country, product_description)
+        if key in snapshot.context_ids:
+            return key
+        alias = snapshot.aliases.get(key)
+        if alias is not None:
+            return alias
+        return snapshot.catalog.resolve(country, product_description)
+
+    def has_context(self, country: str, product_description: str) -> bool:
+        return self.resolve(country, product_description) is not None
+
+    def is_valid(self, country: str, product_description: str) -> bool:
+        key = self.resolve(country, product_description) or context_key(country, product_description)
+        return key not in self._snapshot.invalid
+
+    def search(self, query: str, country: Optional[str] = None, limit: int = 10) -> List[CatalogEntry]:
+        """Contexts whose product name matches a prefix, see ContextCatalog.search."""
+        return self._snapshot.catalog.search(query, country, limit)
+
+    def suggest(self, country: str, product_description: str, limit: int = 3) -> List[CatalogEntry]:
+        """Known contexts with a product name close to an unknown one."""
+        return self._snapshot.catalog.suggest(country, product_description, limit)
+
+    def get(self, country: str, product_description: str, year: int, month: int) -> Optional[ForecastPoint]:
+        snapshot = self._snapshot
+        key = self.resolve(country, product_description)
+        position = self._position(snapshot, key, year, month)
+        if position is None:
+            return self._future_point(snapshot, key, year, month)
+        forecast, lower_ci, upper_ci = snapshot.values[position, :3].tolist()
+        return ForecastPoint(forecast, lower_ci, upper_ci)
+
+    @staticmethod
+    def _position(snapshot: _Snapshot, key: Optional[str], year: int, month: int) -> Optional[int]:
+        """Row of the forecast serving a month of a context, if any."""
+        i = snapshot.context_ids.get(key)
+        column = (year - 1970) * 12 + month - 1 - snapshot.first_month
+        if i is None or not 0 <= column < snapshot.month_rows.shape[1]:
+            return None
+        position = int(snapshot.month_rows[i, column])
+        return position if position >= 0 else None
+
+    @property
+    def horizon(self) -> int:
+        """Days forecast past the history when no horizon is asked for."""
+        return self._snapshot.horizon
+
+    def aggregate(self, **query) -> Optional[List[Dict]]:
+        """Aggregate the stored forecasts, see ForecastRollup.query; None unless serving an artifact."""
+        rollup = self._snapshot.rollup
+        if rollup is None:
+            return None
+        return rollup.query(**query)
+
+    @property
+    def aggregate_end(self) -> Optional[date]:
+        """Last day of the stored forecasts that aggregates cover, None if there are none."""
+        rollup = self._snapshot.rollup
+        if rollup is None or rollup.last_day is None:
+            return None
+        return rollup.last_day.item()
+
+    def model_kind(self, country: str, product_description: str) -> Optional[str]:
+        model = self._snapshot.models.get(self.resolve(country, product_description))
+        return model['kind'] if model is not None else None
+
+    def forecast_horizon(self, country: str, product_description: str,
+                         steps: Optional[int] = None) -> Optional[HorizonForecast]:
+        """Daily forecasts of the `steps` days after a context's history, None if it has no model."""
+        snapshot = self._snapshot
+        return self._forecast(snapshot, self.resolve(country, product_description), steps or snapshot.horizon)
+
+    def _forecast(self, snapshot: _Snapshot, key: Optional[str], steps: int) -> Optional[HorizonForecast]:
+        if steps > self.max_steps:
+            raise ValueError(f"steps must not exceed {self.max_steps}")
+        model = snapshot.models.get(key)
+        if model is None:
+            return None
+        precomputed = snapshot.batch.get(key)
+        if precomputed is not None:
+            return HorizonForecast(*(array[:steps] for array in precomputed))
+        return forecast_model(model, steps)
+
+    def _future_point(self, snapshot: _Snapshot, key: Optional[str], year: int, month: int) -> Optional[ForecastPoint]:
+        """First model forecast of a month after the history, if within `max_steps`."""
+        model = snapshot.models.get(key)
+        if model is None:
+            return None
+        first_day = np.datetime64(f"{year:04d}-{month:02d}-01", 'D')
+        start = np.datetime64(model['last_date'], 'D') + 1
+        day = max(first_day, start)
+        step = int((day - start) / np.timedelta64(1, 'D'))
+        if day.astype('datetime64[M]') != first_day.astype('datetime64[M]') or step >= self.max_steps:
+            return None
+        horizon = self._forecast(snapshot, key, step + 1)
+        return ForecastPoint(float(horizon.forecast[step]), float(horizon.lower[step]), float(horizon.upper[step]))
+
+    def __len__(self):
+        """Number of monthly forecasts served from the forecast tables."""
+        return int(np.count_nonzero(np.asarray(self._snapshot.month_rows) >= 0))
+
+
+forecast_store = ForecastStore(MODELS_DIR, FORECAST_ARTIFACT_DIR, io_threads=FORECAST_IO_THREADS,
+                               mode=FORECAST_MODE, max_steps=FORECAST_MAX_STEPS, shared_dir=FORECAST_SHARED_DIR)
@@ -0,0 +1,256 @@
+import asyncio
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from fastapi.routing import APIRoute
+
+# Latency buckets in seconds; forecast lookups are served from memory, so the
+# low end is finer than Prometheus' defaults
+REQUEST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+PHASE_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, one series per combination of label values."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Histogram:
+    """Cumulative histogram with a sum and a count, one series per combination of label values."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = REQUEST_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket (last is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][position] += 1
+            series[1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="{}"'.format(_format_value(bound))
+                yield f"{self.name}_bucket", _format_labels(self.labelnames, labels, le), cumulative
+            yield f"{self.name}_sum", _format_labels(self.labelnames, labels), total
+            yield f"{self.name}_count", _format_labels(self.labelnames, labels), cumulative
+
+
+class CallbackMetric:
+    """Gauge or counter whose unlabelled value is read from a callback at scrape time."""
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float], kind: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.kind = kind
+
+    def samples(self):
+        yield self.name, "", self.callback()
+
+
+class Registry:
+    """Collection of metrics rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=REQUEST_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, callback, kind="gauge") -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, callback, kind))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by method, route and status code.", ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Time spent serving HTTP requests.", ("method", "route")
+)
+route_phase_duration = registry.histogram(
+    "http_route_phase_duration_seconds",
+    "Time spent per phase of an API route: parse (body and validation), lookup (handler) and serialize (response).",
+    ("route", "phase"),
+    buckets=PHASE_BUCKETS,
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting requests and observing their latency.
+
+    Requests are labelled with the matched route's path, or "unmatched" for
+    requests that hit no route, so unknown URLs cannot grow the label set.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            if route is not None:
+                route = route.path
+            elif "endpoint" in scope:
+                route = scope["path"]
+            else:
+                route = "unmatched"
+            http_request_duration.observe(time.perf_counter() - started, scope["method"], route)
+            http_requests.inc(scope["method"], route, str(status))
+
+
+# Timestamps of the current request's phases, shared by the route handler and
+# the wrapped endpoint of TimedRoute
+_phase_marks: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("phase_marks", default=None)
+
+
+class TimedRoute(APIRoute):
+    """
+    API route recording how long its phases take.
+
+    parse covers reading and validating the request body, lookup the endpoint
+    itself and serialize the response model validation and JSON rendering.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        # Sync endpoints run in a thread pool and are left as they are; routes
+        # copied by include_router already carry the wrapped endpoint
+        if asyncio.iscoroutinefunction(endpoint) and not getattr(endpoint, "_phase_timed", False):
+            original = endpoint
+
+            @functools.wraps(original)
+            async def endpoint(*args, **kw):
+                marks = _phase_marks.get()
+                if marks is not None:
+                    marks.append(time.perf_counter())
+                result = await original(*args, **kw)
+                if marks is not None:
+                    marks.append(time.perf_counter())
+                return result
+
+            endpoint._phase_timed = True
+
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        path = self.path
+
+        async def timed_handler(request):
+            # Filled with: handler start, endpoint start, endpoint end
+            marks = [time.perf_counter()]
+            token = _phase_marks.set(marks)
+            try:
+                response = await handler(request)
+            finally:
+                _phase_marks.reset(token)
+                # An invalid body never reaches the endpoint
+                if len(marks) >= 2:
+                    route_phase_duration.observe(marks[1] - marks[0], path, "parse")
+
+            # Errors raised by the endpoint are answered by the exception handlers
+            if len(marks) == 3:
+                route_phase_duration.observe(marks[2] - marks[1], path, "lookup")
+                route_phase_duration.observe(time.perf_counter() - marks[2], path, "serialize")
+            return response
+
+        return timed_handler
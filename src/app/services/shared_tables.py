@@ -0,0 +1,79 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent builds stay correct, they are only repeated
+    fcntl = None
+
+TABLES_FILE = "tables.json"
+LOCK_FILE = ".lock"
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _exclusive_lock(path: Path):
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _map_tables(path: Path) -> Dict[str, np.ndarray]:
+    with open(path / TABLES_FILE) as f:
+        names = json.load(f)['arrays']
+    return {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in names}
+
+
+def _remove_stale_tables(directory: Path, key: str):
+    for entry in os.scandir(directory):
+        if entry.is_dir() and entry.name != key:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def open_shared_tables(directory, key: str, build: Callable[[], Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """
+    Named arrays built once per `key` and memory-mapped read-only by every process.
+
+    The first process asking for a key calls `build` under an exclusive file
+    lock and saves the arrays to `directory/key`; the others wait for it, then
+    every process maps the same files, so their pages are shared through the
+    page cache instead of being copied into each worker. Tables of other keys
+    are removed once the new ones are in place; processes still mapping them
+    keep their pages until they let go of them.
+    """
+    directory = Path(directory)
+    path = directory / key
+    if (path / TABLES_FILE).is_file():
+        return _map_tables(path)
+
+    directory.mkdir(parents=True, exist_ok=True)
+    with _exclusive_lock(directory / LOCK_FILE):
+        if not (path / TABLES_FILE).is_file():
+            arrays = build()
+            # Written aside and renamed into place, so no process maps a partial table
+            tmp_path = Path(tempfile.mkdtemp(prefix=f".{key}-", dir=directory))
+            for name, array in arrays.items():
+                np.save(tmp_path / f"{name}.npy", np.asarray(array, order="C"))
+            with open(tmp_path / TABLES_FILE, "w") as f:
+                json.dump({'arrays': list(arrays)}, f)
+            os.replace(tmp_path, path)
+            _remove_stale_tables(directory, key)
+            logger.info("Shared forecast tables built", extra={
+                'key': key,
+                'bytes': sum(array.nbytes for array in arrays.values()),
+            })
+    return _map_tables(path)
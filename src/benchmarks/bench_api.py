@@ -0,0 +1,298 @@
+"""
+Load and latency benchmark for the forecast API.
+
+Generates a synthetic forecast directory, starts the app under uvicorn in a
+subprocess and drives the forecast routes with sequential and concurrent
+clients. Throughput and p50/p95/p99 latency of every scenario, and the memory
+of the worker processes, are written as JSON, so runs on different commits
+can be compared.
+
+Run from the project root:
+
+    python -m src.benchmarks.bench_api --contexts 2000 --concurrency 1 8 32
+    python -m src.benchmarks.bench_api --compare benchmark_results/api-<commit>.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from src.app.services.forecast_store import FORECAST_SUFFIX
+from src.benchmarks.common import compare_results, latency_summary, save_results
+from src.supply_chain_optimization.forecast_artifact import write_forecast_artifact
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+
+COUNTRIES = ["United Kingdom", "France", "Germany", "Australia", "Spain", "Netherlands", "EIRE", "Belgium"]
+START_DATE = "2012-01-01"
+
+SINGLE_ROUTE = "/api/v1/forecast/demand"
+BATCH_ROUTE = "/api/v1/forecast/demand/batch"
+
+
+def make_forecasts(contexts: int, days: int, seed: int = 0) -> List[Tuple[Tuple[str, str], pd.DataFrame]]:
+    """
+    Build synthetic daily forecasts for `contexts` (country, product) pairs.
+
+    Args:
+        contexts: Number of contexts
+        days: Forecast horizon of every context, starting at START_DATE
+        seed: Random seed
+
+    Returns:
+        list: ((country, product), forecast frame) pairs in the training pipeline's format
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(START_DATE, periods=days, freq='D')
+    forecasts = []
+    for i in range(contexts):
+        country = COUNTRIES[i % len(COUNTRIES)]
+        product = f"SYNTHETIC PRODUCT {i:06d}"
+        forecast = rng.gamma(2.0, 5.0, size=days)
+        margin = rng.uniform(0.5, 3.0, size=days)
+        frame = pd.DataFrame({
+            'Date': dates,
+            'Forecasted_Quantity': forecast,
+            'Lower_Bound': forecast - margin,
+            'Upper_Bound': forecast + margin,
+            'Actual': np.zeros(days),
+        })
+        forecasts.append(((country, product), frame))
+    return forecasts
+
+
+def make_models_dir(root: Path, contexts: int, days: int, layout: str = "artifact", seed: int = 0) -> Dict:
+    """
+    Write a synthetic forecast directory the API can serve.
+
+    Args:
+        root: Directory to write into
+        contexts: Number of (country, product) contexts
+        days: Days forecast per context
+        layout: "artifact" for the consolidated artifact, "csv" for per-context files
+        seed: Random seed
+
+    Returns:
+        dict: models_dir, artifact_dir and the generated contexts
+    """
+    models_dir = root / "demand_predictions"
+    artifact_dir = root / "forecast_artifact"
+    models_dir.mkdir(parents=True, exist_ok=True)
+
+    forecasts = make_forecasts(contexts, days, seed)
+    if layout == "artifact":
+        write_forecast_artifact(forecasts, artifact_dir)
+    elif layout == "csv":
+        for (country, product), frame in forecasts:
+            name = f"{country}_{product}".replace(" ", "_")
+            frame.to_csv(models_dir / f"{name}{FORECAST_SUFFIX}", index=False)
+    else:
+        raise ValueError(f"Unknown layout: {layout}")
+
+    return {
+        'models_dir': models_dir,
+        'artifact_dir': artifact_dir,
+        'contexts': [context for context, _ in forecasts],
+    }
+
+
+def make_payloads(contexts: List[Tuple[str, str]], days: int, count: int, miss_rate: float = 0.0, seed: int = 0) -> List[Dict]:
+    """Random forecast requests; a `miss_rate` share asks for a product that does not exist."""
+    rng = random.Random(seed)
+    months = pd.period_range(START_DATE, periods=days, freq='D').asfreq('M').unique()
+    payloads = []
+    for _ in range(count):
+        country, product = rng.choice(contexts)
+        if rng.random() < miss_rate:
+            product = f"MISSING PRODUCT {rng.randrange(10 ** 6):06d}"
+        month = rng.choice(months)
+        payloads.append({
+            'year': month.year,
+            'month': month.month,
+            'country': country,
+            'product_description': product,
+        })
+    return payloads
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(models_dir: Path, artifact_dir: Path, port: int, workers: int = 1, timeout: float = 60.0) -> subprocess.Popen:
+    """Start the API under uvicorn and wait until it answers."""
+    env = dict(os.environ, TEST_MODELS_DIR=str(models_dir), FORECAST_ARTIFACT_DIR=str(artifact_dir))
+    env.setdefault("LOG_LEVEL", "WARNING")
+    command = [
+        sys.executable, "-m", "uvicorn", "src.app.main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning", "--no-access-log",
+    ]
+    server = subprocess.Popen(command, cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {server.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1.0).status_code == 200:
+                return server
+        except httpx.TransportError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"API did not start within {timeout} seconds")
+
+
+def stop_server(server: subprocess.Popen):
+    server.terminate()
+    try:
+        server.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+def worker_memory(pid: int) -> Dict:
+    """
+    Resident (RSS) and proportional (PSS) memory of the server's worker
+    processes, in MB; Linux only. PSS splits shared pages between the processes
+    mapping them, so unlike RSS its total does not count them once per worker.
+    """
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids = [int(child) for child in f.read().split()] or [pid]
+        totals = {'Rss': 0, 'Pss': 0}
+        for worker in pids:
+            with open(f"/proc/{worker}/smaps_rollup") as f:
+                for line in f:
+                    name, _, value = line.partition(":")
+                    if name in totals:
+                        totals[name] += int(value.split()[0])
+    except OSError:
+        return {}
+    return {'processes': len(pids), 'rss_mb': round(totals['Rss'] / 1024, 1), 'pss_mb': round(totals['Pss'] / 1024, 1)}
+
+
+async def run_load(base_url: str, route: str, payloads: List[Dict], concurrency: int) -> Dict:
+    """
+    Send every payload to `route` using `concurrency` concurrent clients.
+
+    Returns:
+        dict: Latency summary of the run (see latency_summary)
+    """
+    queue = asyncio.Queue()
+    for payload in payloads:
+        queue.put_nowait(payload)
+    latencies, errors = [], 0
+
+    async def client_loop(client):
+        nonlocal errors
+        while True:
+            try:
+                payload = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            try:
+                response = await client.post(route, json=payload)
+                # Misses are an expected answer, anything else counts as an error
+                if response.status_code not in (200, 404):
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latency_summary(latencies, elapsed, errors)
+
+
+def run_benchmark(args) -> List[Dict]:
+    results = []
+    with tempfile.TemporaryDirectory(prefix="forecast-bench-") as tmp:
+        started = time.perf_counter()
+        data = make_models_dir(Path(tmp), args.contexts, args.days, args.layout, args.seed)
+        print(f"Generated {args.contexts} contexts x {args.days} days ({args.layout}) "
+              f"in {time.perf_counter() - started:.1f}s")
+
+        port = free_port()
+        started = time.perf_counter()
+        server = start_server(data['models_dir'], data['artifact_dir'], port, args.workers)
+        startup = time.perf_counter() - started
+        print(f"API ready after {startup:.2f}s")
+        base_url = f"http://127.0.0.1:{port}"
+
+        try:
+            payloads = make_payloads(data['contexts'], args.days, args.requests, args.miss_rate, args.seed)
+            # Warm up connections and the response cache path
+            asyncio.run(run_load(base_url, SINGLE_ROUTE, payloads[:args.warmup], 1))
+
+            for concurrency in args.concurrency:
+                summary = asyncio.run(run_load(base_url, SINGLE_ROUTE, payloads, concurrency))
+                results.append({'scenario': 'single', 'concurrency': concurrency, **summary})
+                print(f"single  c={concurrency:<4} {summary['throughput_rps']:>9} req/s  "
+                      f"p50 {summary.get('p50_ms')}ms  p95 {summary.get('p95_ms')}ms  p99 {summary.get('p99_ms')}ms")
+
+            if args.batch_size:
+                batches = [
+                    {'requests': payloads[i:i + args.batch_size]}
+                    for i in range(0, len(payloads), args.batch_size)
+                ]
+                for concurrency in args.concurrency:
+                    summary = asyncio.run(run_load(base_url, BATCH_ROUTE, batches, concurrency))
+                    summary['items_per_second'] = round(summary['throughput_rps'] * args.batch_size, 2)
+                    results.append({'scenario': 'batch', 'concurrency': concurrency, **summary})
+                    print(f"batch   c={concurrency:<4} {summary['items_per_second']:>9} items/s  "
+                          f"p50 {summary.get('p50_ms')}ms  p95 {summary.get('p95_ms')}ms  p99 {summary.get('p99_ms')}ms")
+            memory = worker_memory(server.pid)
+        finally:
+            stop_server(server)
+
+    results.append({'scenario': 'startup', 'concurrency': None, 'elapsed_seconds': round(startup, 4)})
+    if memory:
+        results.append({'scenario': 'memory', 'concurrency': None, 'workers': args.workers, **memory})
+        print(f"workers {memory['processes']}: RSS {memory['rss_mb']} MB, PSS {memory['pss_mb']} MB")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the forecast API under uvicorn")
+    parser.add_argument("--contexts", type=int, default=1000, help="synthetic (country, product) contexts (default: 1000)")
+    parser.add_argument("--days", type=int, default=365, help="days forecast per context (default: 365)")
+    parser.add_argument("--layout", choices=["artifact", "csv"], default="artifact",
+                        help="forecast storage to serve from (default: artifact)")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario (default: 2000)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32],
+                        help="concurrent clients, one scenario each (default: 1 8 32)")
+    parser.add_argument("--batch-size", type=int, default=0, help="also benchmark the batch route with this batch size")
+    parser.add_argument("--miss-rate", type=float, default=0.1, help="share of requests for unknown products (default: 0.1)")
+    parser.add_argument("--warmup", type=int, default=100, help="sequential warm-up requests (default: 100)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes (default: 1)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="result file (default: benchmark_results/api-<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    results = run_benchmark(args)
+    path = save_results("api", vars(args), results, args.output)
+    print(f"\nResults saved to {path}")
+
+    if args.compare:
+        compare_results(args.compare, results, ['scenario', 'concurrency'],
+                        ['throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'elapsed_seconds'])
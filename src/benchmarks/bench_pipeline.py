@@ -0,0 +1,223 @@
+"""
+Benchmark of the MapReduce engine and the training pipeline.
+
+Generates synthetic invoices in the shape of the raw data and times every
+engine stage (row-mode map/shuffle/reduce, columnar, parallel, streaming) and
+every training stage (write_processed, load_data, prepare_time_series, decompose_series,
+fit_predict_baselines, fit_predict_arima searched and warm-started) across row
+and context counts. Each stage records its wall time, throughput and peak
+traced memory; results are written as JSON.
+
+Run from the project root:
+
+    python -m src.benchmarks.bench_pipeline --rows 10000 100000 1000000 --contexts 100 1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.benchmarks.common import compare_results, measure, save_results
+
+# The mapreduce and training modules import their siblings as top-level modules
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for package in ("mapreduce", "supply_chain_optimization"):
+    path = os.path.join(SRC_DIR, package)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from engine import MapReduceEngine  # noqa: E402
+from mapper import demand_context_mapper  # noqa: E402
+from reducer import sum_reducer  # noqa: E402
+from run_mapreduce import write_demand_table  # noqa: E402
+
+COUNTRIES = ["United Kingdom", "Germany", "France", "EIRE", "Spain", "Netherlands", "Belgium", "Australia"]
+START_DATE = "2010-12-01"
+
+# Raw invoices have about twenty lines per invoice, all with the same timestamp
+LINES_PER_INVOICE = 20
+
+
+def make_invoices(rows: int, contexts: int, days: int = 365, seed: int = 0) -> pd.DataFrame:
+    """
+    Synthetic invoice lines in the shape of the raw retail data.
+
+    Args:
+        rows: Number of invoice lines
+        contexts: Number of distinct (Country, Description) pairs
+        days: Days the invoice dates are spread over
+        seed: Random seed
+
+    Returns:
+        pd.DataFrame: InvoiceNo, StockCode, Description, Quantity, InvoiceDate,
+            UnitPrice, CustomerID and Country columns
+    """
+    rng = np.random.default_rng(seed)
+
+    # Popularity of the contexts follows a long tail, as products do in the raw data
+    weights = 1.0 / np.arange(1, contexts + 1)
+    context_ids = rng.choice(contexts, size=rows, p=weights / weights.sum())
+    countries = np.array(COUNTRIES)[context_ids % len(COUNTRIES)]
+    descriptions = np.char.add("SYNTHETIC PRODUCT ", np.char.zfill((context_ids // len(COUNTRIES)).astype(str), 5))
+
+    invoices = max(rows // LINES_PER_INVOICE, 1)
+    invoice_ids = np.sort(rng.integers(0, invoices, size=rows))
+    minutes = np.sort(rng.integers(0, days * 24 * 60, size=invoices))
+    invoice_dates = np.datetime64(START_DATE, 'm') + minutes
+
+    return pd.DataFrame({
+        'InvoiceNo': (536365 + invoice_ids).astype(str),
+        'StockCode': (10000 + context_ids // len(COUNTRIES)).astype(str),
+        'Description': descriptions,
+        'Quantity': rng.integers(1, 25, size=rows),
+        'InvoiceDate': pd.to_datetime(invoice_dates[invoice_ids]),
+        'UnitPrice': rng.uniform(0.1, 10.0, size=rows).round(2),
+        'CustomerID': rng.integers(12346, 18288, size=rows).astype(float),
+        'Country': countries,
+    })
+
+
+def record(results: List[Dict], group: str, stage: str, rows: int, contexts: int, seconds: float,
+           peak_mb: Optional[float], records_in: int, records_out: Optional[int] = None):
+    result = {
+        'group': group,
+        'stage': stage,
+        'rows': rows,
+        'contexts': contexts,
+        'seconds': round(seconds, 4),
+        'records_in': records_in,
+        'records_out': records_out,
+        'records_per_second': round(records_in / seconds, 1) if seconds > 0 else None,
+        'peak_memory_mb': round(peak_mb, 2) if peak_mb is not None else None,
+    }
+    results.append(result)
+    print(f"{group:<9} {stage:<22} rows={rows:<9} contexts={contexts:<6} {seconds:>9.3f}s  "
+          f"{result['records_per_second'] or 0:>12.0f} rec/s  peak {result['peak_memory_mb']} MB")
+
+
+def bench_engine(invoices: pd.DataFrame, contexts: int, args, tmp_dir: str, results: List[Dict]) -> Dict:
+    rows = len(invoices)
+    trace = not args.no_memory
+
+    if rows <= args.row_mode_max_rows:
+        # Per-stage numbers of the row path come from the engine's own metrics
+        engine = MapReduceEngine(demand_context_mapper, sum_reducer, mode="row", trace_memory=trace)
+        _, metrics = engine.execute(invoices, with_metrics=True)
+        for stage in metrics.stages:
+            peak = stage.peak_memory_bytes / 2 ** 20 if stage.peak_memory_bytes is not None else None
+            record(results, "engine", f"row_{stage.name}", rows, contexts, stage.seconds, peak,
+                   stage.records_in, stage.records_out)
+
+    engine = MapReduceEngine(demand_context_mapper, sum_reducer, mode="columnar")
+    reduced, seconds, peak = measure(engine.execute, invoices, trace_memory=trace)
+    record(results, "engine", "columnar", rows, contexts, seconds, peak, rows, len(reduced))
+
+    if args.workers > 1:
+        engine = MapReduceEngine(demand_context_mapper, sum_reducer, workers=args.workers)
+        parallel, seconds, peak = measure(engine.execute, invoices, trace_memory=trace)
+        record(results, "engine", f"parallel_{args.workers}", rows, contexts, seconds, peak, rows, len(parallel))
+
+    path = os.path.join(tmp_dir, "invoices.csv")
+    invoices.to_csv(path, index=False)
+    columns = [*demand_context_mapper.key_columns, demand_context_mapper.value_column]
+    engine = MapReduceEngine(demand_context_mapper, sum_reducer)
+    streamed, seconds, peak = measure(
+        lambda: engine.execute_stream(pd.read_csv(path, usecols=columns, chunksize=args.chunksize)),
+        trace_memory=trace,
+    )
+    record(results, "engine", "stream_csv", rows, contexts, seconds, peak, rows, len(streamed))
+    return reduced
+
+
+def bench_training(engine_results: Dict, rows: int, contexts: int, args, tmp_dir: str, results: List[Dict]):
+    import demand_modelling
+
+    trace = not args.no_memory
+    path = os.path.join(tmp_dir, "demand_processed.parquet")
+    processed, seconds, peak = measure(write_demand_table, engine_results, path, trace_memory=trace)
+    record(results, "training", "write_processed", rows, contexts, seconds, peak, len(engine_results), len(processed))
+
+    df, seconds, peak = measure(demand_modelling.load_data, path, trace_memory=trace)
+    record(results, "training", "load_data", rows, contexts, seconds, peak, len(processed), len(df))
+
+    series, seconds, peak = measure(demand_modelling.prepare_time_series, df, trace_memory=trace)
+    record(results, "training", "prepare_time_series", rows, contexts, seconds, peak, len(df), len(series))
+
+    eligible = [c for c in series if series.length(c) >= demand_modelling.MIN_SERIES_LENGTH]
+    sample = eligible[:args.decompose_contexts]
+    if sample:
+        _, seconds, peak = measure(lambda: [demand_modelling.decompose_series(series[c]) for c in sample],
+                                   trace_memory=trace)
+        record(results, "training", "decompose_series", rows, contexts, seconds, peak,
+               sum(series.length(c) for c in sample), len(sample))
+
+    if eligible:
+        # Every eligible context at once, on the raw daily series
+        from baseline_models import fit_predict_baselines, pad_series
+        values, lengths = pad_series([series[c].to_numpy(dtype='float64') for c in eligible])
+        _, seconds, peak = measure(fit_predict_baselines, values, lengths, trace_memory=trace)
+        record(results, "training", "fit_predict_baselines", rows, contexts, seconds, peak,
+               int(lengths.sum()), len(eligible))
+
+    sample = eligible[:args.fit_contexts]
+    if sample:
+        fits, seconds, peak = measure(lambda: [demand_modelling.fit_predict_arima(series[c]) for c in sample],
+                                      trace_memory=trace)
+        record(results, "training", "fit_predict_arima", rows, contexts, seconds, peak,
+               sum(series.length(c) for c in sample), len(sample))
+
+        # Refit from the orders just searched, as a rerun on changed data does
+        _, seconds, peak = measure(
+            lambda: [demand_modelling.fit_predict_arima(series[c], warm_start=fit[-1]) for c, fit in zip(sample, fits)],
+            trace_memory=trace,
+        )
+        record(results, "training", "fit_predict_arima_warm", rows, contexts, seconds, peak,
+               sum(series.length(c) for c in sample), len(sample))
+
+
+def run_benchmark(args) -> List[Dict]:
+    results = []
+    for contexts in args.contexts:
+        for rows in args.rows:
+            invoices = make_invoices(rows, contexts, args.days, args.seed)
+            with tempfile.TemporaryDirectory(prefix="pipeline-bench-") as tmp_dir:
+                engine_results = bench_engine(invoices, contexts, args, tmp_dir, results)
+                if not args.engine_only:
+                    bench_training(engine_results, rows, contexts, args, tmp_dir, results)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the MapReduce engine and the training pipeline")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="invoice lines per run (default: 10000 100000 1000000)")
+    parser.add_argument("--contexts", type=int, nargs="+", default=[100, 1000],
+                        help="distinct (country, product) pairs per run (default: 100 1000)")
+    parser.add_argument("--days", type=int, default=365, help="days the invoices span (default: 365)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes for the parallel engine run (default: all cores)")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="rows per chunk when streaming (default: 100000)")
+    parser.add_argument("--row-mode-max-rows", type=int, default=100_000,
+                        help="skip the per-row engine stages above this many rows (default: 100000)")
+    parser.add_argument("--decompose-contexts", type=int, default=100,
+                        help="contexts decomposed per run (default: 100)")
+    parser.add_argument("--fit-contexts", type=int, default=5, help="contexts fitted with ARIMA per run (default: 5)")
+    parser.add_argument("--engine-only", action="store_true", help="skip the training stages")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="do not trace peak memory, which slows down allocation-heavy stages")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="result file (default: benchmark_results/pipeline-<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    results = run_benchmark(args)
+    path = save_results("pipeline", vars(args), results, args.output)
+    print(f"\nResults saved to {path}")
+
+    if args.compare:
+        compare_results(args.compare, results, ['group', 'stage', 'rows', 'contexts'],
+                        ['seconds', 'records_per_second', 'peak_memory_mb'])
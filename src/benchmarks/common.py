@@ -0,0 +1,128 @@
+"""Helpers shared by the benchmark scripts: summaries, result files and comparisons."""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+DEFAULT_RESULTS_DIR = "benchmark_results"
+
+
+def latency_summary(latencies: Iterable[float], elapsed: float, errors: int = 0) -> Dict:
+    """
+    Summarize request latencies measured in seconds.
+
+    Args:
+        latencies: Latency of every completed request
+        elapsed: Wall time of the whole run, used for the throughput
+        errors: Requests that failed or returned an unexpected status
+
+    Returns:
+        dict: Request count, throughput and latency percentiles in milliseconds
+    """
+    latencies = np.asarray(list(latencies), dtype=float) * 1000
+    summary = {
+        'requests': int(len(latencies)),
+        'errors': int(errors),
+        'elapsed_seconds': round(elapsed, 4),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+    if len(latencies):
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        summary.update({
+            'mean_ms': round(float(latencies.mean()), 3),
+            'p50_ms': round(float(p50), 3),
+            'p95_ms': round(float(p95), 3),
+            'p99_ms': round(float(p99), 3),
+            'max_ms': round(float(latencies.max()), 3),
+        })
+    return summary
+
+
+def measure(fn, *args, trace_memory: bool = True, **kwargs):
+    """
+    Run fn(*args, **kwargs) once and measure it.
+
+    Peak memory is the largest amount traced by tracemalloc during the call,
+    which covers Python objects and NumPy/pandas buffers. Tracing slows down
+    allocation-heavy Python code, so pass trace_memory=False for clean timings.
+
+    Returns:
+        tuple: (result, seconds, peak memory in MB or None)
+    """
+    if trace_memory:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+    started = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+        seconds = time.perf_counter() - started
+    finally:
+        peak = None
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+    return result, seconds, peak
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(name: str, config: Dict, results: List[Dict], output: Optional[str] = None) -> str:
+    """
+    Write benchmark results as JSON, tagged with the commit and environment.
+
+    Returns:
+        str: Path of the written file
+    """
+    if output is None:
+        output = os.path.join(DEFAULT_RESULTS_DIR, f"{name}-{git_commit() or 'unknown'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+
+    report = {
+        'benchmark': name,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'commit': git_commit(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': config,
+        'results': results,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    return output
+
+
+def compare_results(baseline_path: str, results: List[Dict], key_fields: List[str], metrics: List[str]):
+    """Print the relative change of each metric against an earlier result file."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+
+    def key(result):
+        return tuple(result.get(field) for field in key_fields)
+
+    previous = {key(result): result for result in baseline}
+    print(f"\nComparison with {baseline_path}:")
+    for result in results:
+        before = previous.get(key(result))
+        if before is None:
+            continue
+        changes = []
+        for metric in metrics:
+            old, new = before.get(metric), result.get(metric)
+            if old and new is not None:
+                changes.append(f"{metric} {old} -> {new} ({(new - old) / old:+.1%})")
+        print(f"  {key(result)}: " + ", ".join(changes))
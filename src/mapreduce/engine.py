@@ -1,21 +1,121 @@
+import os
+import zlib
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, nullcontext
+
+import pandas as pd
+
+from metrics import JobMetrics, timed_records
+
+
+def _partition_of(key, partitions):
+    """Stable hash partition of a key; the built-in hash() is salted per process."""
+    return zlib.crc32(repr(key).encode()) % partitions
+
+
+def _columnar_partition(engine, chunk):
+    return engine._columnar_stage(chunk)
+
+
+def _map_partition(engine, chunk, partitions):
+    """Map one input partition and split its output into one bucket per reduce partition."""
+    buckets = [{} for _ in range(partitions)]
+    for key, values in engine._shuffle_stage(engine._map_stage(chunk)).items():
+        buckets[_partition_of(key, partitions)][key] = values
+    return buckets
+
+
+def _reduce_partition(engine, buckets):
+    """Merge the buckets every map task produced for one partition and reduce them."""
+    shuffled = defaultdict(list)
+    for bucket in buckets:
+        for key, values in bucket.items():
+            shuffled[key].extend(values)
+    return engine._reduce_stage(shuffled)
+
+
 class MapReduceEngine:
-    def __init__(self, mapper, reducer):
+    def __init__(self, mapper, reducer, mode="auto", workers=1, combiner=None, hooks=(), trace_memory=False):
+        """
+        Args:
+            mapper: Function mapping a row to a list of (key, value) pairs. It may
+                also declare `key_columns`, `value_column` and `build_key` so the
+                engine can process whole DataFrames at once.
+            reducer: Function reducing (key, values) to a result. It may declare
+                an `aggregate` name (e.g. "sum") understood by pandas groupby.
+            mode: "row" calls the mapper on every row, "columnar" runs map,
+                shuffle and reduce as a single groupby-aggregate, "auto" uses
+                the columnar path whenever the mapper and reducer support it.
+            workers: Number of worker processes. With more than one, the input is
+                split into partitions that are mapped in a process pool, keys are
+                hash-partitioned and each partition is reduced in parallel.
+                None uses every available core.
+            combiner: Optional function folding the values of a key as they
+                are shuffled, so only one partial value per key is kept. It must
+                return a value the reducer accepts alongside raw values. Defaults
+                to the `combiner` the reducer declares, if any (sum_reducer is
+                its own combiner).
+            hooks: Callables invoked with the JobMetrics of every finished job,
+                e.g. to export them to a metrics system.
+            trace_memory: Record the peak memory of each stage with tracemalloc.
+                Off by default since tracing slows down the row path. Only
+                this process is traced, not the pool workers.
+        """
+        if mode not in ("auto", "row", "columnar"):
+            raise ValueError(f"Unknown execution mode: {mode}")
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
         self.mapper = mapper
         self.reducer = reducer
+        self.mode = mode
+        self.workers = workers
+        self.combiner = combiner if combiner is not None else getattr(reducer, "combiner", None)
+        self.hooks = list(hooks)
+        self.trace_memory = trace_memory
+        # Stage metrics of the last job run by this engine
+        self.metrics = None
+
+    def __getstate__(self):
+        # Workers only run stages; hooks may not be picklable and metrics stay here
+        state = self.__dict__.copy()
+        state['hooks'] = []
+        state['metrics'] = None
+        return state
+
+    def _supports_columnar(self, data_source):
+        return (
+            isinstance(data_source, pd.DataFrame)
+            and hasattr(self.mapper, "key_columns")
+            and hasattr(self.mapper, "value_column")
+            and getattr(self.reducer, "aggregate", None) is not None
+        )
 
     def _map_stage(self, data_source):
-        # data_source is a DataFrame
-        mapped = []
+        # data_source is a DataFrame; pairs are yielded lazily so the shuffle
+        # can consume them without materializing every mapped record
         for _, row in data_source.iterrows():
-            mapped.extend(self.mapper(row))
-        return mapped
+            yield from self.mapper(row)
 
     def _shuffle_stage(self, mapped):
-        from collections import defaultdict
-        shuffled = defaultdict(list)
+        if self.combiner is None:
+            shuffled = defaultdict(list)
+            for key, value in mapped:
+                shuffled[key].append(value)
+            return shuffled
+
+        # Fold each value into its key's partial as it arrives, keeping memory
+        # proportional to the number of keys instead of the number of records
+        combine = self.combiner
+        combined = {}
         for key, value in mapped:
-            shuffled[key].append(value)
-        return shuffled
+            if key in combined:
+                combined[key] = combine(key, [combined[key], value])
+            else:
+                combined[key] = value
+        return {key: [value] for key, value in combined.items()}
 
     def _reduce_stage(self, shuffled):
         reduced = {}
@@ -23,8 +123,196 @@ class MapReduceEngine:
             reduced[key] = self.reducer(key, values)
         return reduced
 
-    def execute(self, data_source):
-        mapped = self._map_stage(data_source)
-        shuffled = self._shuffle_stage(mapped)
-        reduced = self._reduce_stage(shuffled)
-        return reduced
\ No newline at end of file
+    def _columnar_stage(self, data_source):
+        """Map, shuffle and reduce in one vectorized groupby over the key columns."""
+        key_columns = list(self.mapper.key_columns)
+        build_key = getattr(self.mapper, "build_key", None)
+
+        # Rows with a missing key go through the row path so their keys are built
+        # exactly as the mapper would build them
+        missing = data_source[key_columns].isna().any(axis=1)
+
+        # observed=True: categorical keys must only yield the combinations that
+        # occur, as the row path does, not their full cross product
+        grouped = (
+            data_source.loc[~missing]
+            .groupby(key_columns, sort=False, observed=True)[self.mapper.value_column]
+            .agg(self.reducer.aggregate)
+        )
+        keys = grouped.index if len(key_columns) > 1 else ((key,) for key in grouped.index)
+        reduced = {
+            build_key(*key) if build_key else key: value
+            for key, value in zip(keys, grouped.tolist())
+        }
+
+        if missing.any():
+            rest = self._reduce_stage(self._shuffle_stage(self._map_stage(data_source.loc[missing])))
+            reduced.update(rest)
+        return reduced
+
+    def _map_shuffle(self, data_source, metrics):
+        map_stage = metrics.record("map")
+        map_stage.records_in += len(data_source)
+        # The map stage runs lazily inside the shuffle loop: its time is split
+        # out of the shuffle, and its memory is part of the shuffle's peak
+        map_seconds = map_stage.seconds
+        with metrics.stage("shuffle") as stage:
+            records_before = map_stage.records_out
+            shuffled = self._shuffle_stage(timed_records(self._map_stage(data_source), map_stage))
+            stage.records_in += map_stage.records_out - records_before
+            stage.records_out += len(shuffled)
+            stage.observe_keys(len(shuffled))
+        stage.seconds -= map_stage.seconds - map_seconds
+        return shuffled
+
+    def _execute_rows(self, data_source, metrics):
+        shuffled = self._map_shuffle(data_source, metrics)
+        with metrics.stage("reduce") as stage:
+            reduced = self._reduce_stage(shuffled)
+            stage.records_in += len(shuffled)
+            stage.records_out += len(reduced)
+            stage.observe_keys(len(reduced))
+        return reduced
+
+    def _pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers)
+
+    def _execute_parallel(self, data_source, columnar, metrics, pool=None):
+        """Run the job in a process pool; `pool` is reused if given, else one is created for this job."""
+        partitions = self.workers
+        with nullcontext(pool) if pool is not None else self._pool() as pool:
+            with metrics.stage("partition") as stage:
+                if columnar:
+                    # Rows are hash-partitioned on their key columns up front, so every
+                    # partition owns a disjoint set of keys and can be reduced on its own
+                    key_columns = list(self.mapper.key_columns)
+                    codes = pd.util.hash_pandas_object(data_source[key_columns], index=False).to_numpy() % partitions
+                    chunks = [data_source[codes == p] for p in range(partitions)]
+                else:
+                    bounds = [len(data_source) * i // partitions for i in range(partitions + 1)]
+                    chunks = [data_source.iloc[start:stop] for start, stop in zip(bounds, bounds[1:])]
+                stage.records_in += len(data_source)
+                stage.records_out += len(data_source)
+
+            if columnar:
+                with metrics.stage("columnar") as stage:
+                    partials = list(pool.map(_columnar_partition, [self] * partitions, chunks))
+                    stage.records_in += len(data_source)
+                    stage.records_out += sum(len(partial) for partial in partials)
+            else:
+                with metrics.stage("map") as stage:
+                    # Workers map and combine their partition before handing it back
+                    mapped = list(pool.map(_map_partition, [self] * partitions, chunks, [partitions] * partitions))
+                    stage.records_in += len(data_source)
+                    stage.records_out += sum(len(bucket) for buckets in mapped for bucket in buckets)
+                with metrics.stage("reduce") as stage:
+                    stage.records_in += sum(len(bucket) for buckets in mapped for bucket in buckets)
+                    partials = list(pool.map(
+                        _reduce_partition,
+                        [self] * partitions,
+                        [[buckets[p] for buckets in mapped] for p in range(partitions)],
+                    ))
+                    stage.records_out += sum(len(partial) for partial in partials)
+
+            with metrics.stage("merge") as stage:
+                reduced = {}
+                for partial in partials:
+                    reduced.update(partial)
+                stage.records_in += sum(len(partial) for partial in partials)
+                stage.records_out += len(reduced)
+                stage.observe_keys(len(reduced))
+        return reduced
+
+    def _execute(self, data_source, metrics, pool=None):
+        if self.mode == "columnar" and not self._supports_columnar(data_source):
+            raise ValueError("Columnar mode needs a DataFrame and a mapper/reducer that declare their columns")
+        columnar = self.mode != "row" and self._supports_columnar(data_source)
+
+        if self.workers > 1 and isinstance(data_source, pd.DataFrame):
+            return self._execute_parallel(data_source, columnar, metrics, pool)
+        if columnar:
+            with metrics.stage("columnar") as stage:
+                reduced = self._columnar_stage(data_source)
+                stage.records_in += len(data_source)
+                stage.records_out += len(reduced)
+                stage.observe_keys(len(reduced))
+            return reduced
+
+        return self._execute_rows(data_source, metrics)
+
+    def _partial_stage(self, chunk, metrics, pool=None):
+        """Reduce one chunk to partial values that the combiner can fold further."""
+        if self.combiner is self.reducer:
+            # A reducer that is its own combiner already yields valid partials,
+            # so the chunk can take the columnar or parallel path
+            return self._execute(chunk, metrics, pool)
+        shuffled = self._map_shuffle(chunk, metrics)
+        return {key: self.combiner(key, values) for key, values in shuffled.items()}
+
+    def _job_metrics(self):
+        return JobMetrics(self.hooks, self.trace_memory)
+
+    def execute_stream(self, chunks, with_metrics=False):
+        """
+        Run the job over an iterable of DataFrame chunks, e.g. pd.read_csv(..., chunksize=n).
+
+        Each chunk is mapped and combined on its own and folded into running
+        partial values, so memory grows with the number of distinct keys rather
+        than with the number of input rows. Requires a combiner.
+
+        The "read" stage measures the time spent producing chunks (e.g. CSV
+        parsing), and the per-chunk stages accumulate over all chunks. With
+        `with_metrics`, returns (results, JobMetrics).
+
+        With several workers, one process pool serves every chunk of the job.
+        """
+        if self.combiner is None:
+            raise ValueError("Streaming execution needs a combiner")
+
+        with ExitStack() as stack:
+            metrics = stack.enter_context(self._job_metrics())
+            pool = None
+            if self.workers > 1 and self.combiner is self.reducer:
+                pool = stack.enter_context(self._pool())
+            partials = {}
+            chunks = iter(chunks)
+            while True:
+                with metrics.stage("read") as stage:
+                    chunk = next(chunks, None)
+                    if chunk is not None:
+                        stage.records_in += len(chunk)
+                        stage.records_out += len(chunk)
+                if chunk is None:
+                    break
+
+                chunk_partials = self._partial_stage(chunk, metrics, pool)
+                with metrics.stage("combine") as stage:
+                    for key, value in chunk_partials.items():
+                        if key in partials:
+                            partials[key] = self.combiner(key, [partials[key], value])
+                        else:
+                            partials[key] = value
+                    stage.records_in += len(chunk_partials)
+                    stage.records_out = len(partials)
+                    stage.observe_keys(len(partials))
+
+            with metrics.stage("reduce") as stage:
+                results = {key: self.reducer(key, [value]) for key, value in partials.items()}
+                stage.records_in += len(partials)
+                stage.records_out += len(results)
+                stage.observe_keys(len(results))
+
+        self.metrics = metrics
+        return (results, metrics) if with_metrics else results
+
+    def execute(self, data_source, with_metrics=False):
+        """
+        Run the job over a DataFrame.
+
+        Stage metrics of the run are kept in `self.metrics`; with
+        `with_metrics`, returns (results, JobMetrics).
+        """
+        with self._job_metrics() as metrics:
+            results = self._execute(data_source, metrics)
+        self.metrics = metrics
+        return (results, metrics) if with_metrics else results
@@ -9,3 +9,15 @@ def demand_context_mapper(row):
     context = (row["Country"], row["Description"])  # or build context from multiple columns
     quantity = row["Quantity"]
     return [((date, context), quantity)]
+
+
+def demand_context_key(date, country, description):
+    """Build the (date, context) key of demand_context_mapper from its key columns."""
+    return (date, (country, description))
+
+
+# Columnar description of demand_context_mapper, used by the engine to group
+# whole DataFrames instead of calling the mapper once per row
+demand_context_mapper.key_columns = ("InvoiceDate", "Country", "Description")
+demand_context_mapper.value_column = "Quantity"
+demand_context_mapper.build_key = demand_context_key
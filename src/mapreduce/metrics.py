@@ -0,0 +1,144 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Callable, Iterable, List, Optional
+
+
+@dataclass
+class StageMetrics:
+    """Measurements of one stage of a MapReduce job."""
+    name: str
+    seconds: float = 0.0
+    records_in: int = 0
+    records_out: int = 0
+    distinct_keys: Optional[int] = None
+    peak_memory_bytes: Optional[int] = None
+
+    def observe_keys(self, count: int):
+        """Record a distinct key count; a stage run per chunk keeps the largest."""
+        self.distinct_keys = max(self.distinct_keys or 0, count)
+
+    @property
+    def records_per_second(self) -> Optional[float]:
+        return self.records_in / self.seconds if self.seconds > 0 else None
+
+
+class JobMetrics:
+    """
+    Stage-level metrics of one MapReduce job.
+
+    Stages are recorded in the order they first run; a stage that runs several
+    times (e.g. once per chunk of a streamed job) accumulates into one entry.
+    With `trace_memory`, each stage also records the peak memory traced by
+    tracemalloc in this process while it ran, which slows down allocation-heavy
+    Python code. Hooks are called with the finished JobMetrics, so they can
+    export the measurements to a metrics system.
+    """
+
+    def __init__(self, hooks: Iterable[Callable[["JobMetrics"], None]] = (), trace_memory: bool = False):
+        self.hooks = list(hooks)
+        self.trace_memory = trace_memory
+        self.stages: List[StageMetrics] = []
+        self.seconds = 0.0
+        self._started = None
+        self._owns_tracing = False
+
+    def __enter__(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracing = True
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self._started
+        if self._owns_tracing:
+            tracemalloc.stop()
+            self._owns_tracing = False
+        if exc_type is None:
+            for hook in self.hooks:
+                hook(self)
+
+    def get(self, name: str) -> Optional[StageMetrics]:
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        return None
+
+    def __getitem__(self, name: str) -> StageMetrics:
+        stage = self.get(name)
+        if stage is None:
+            raise KeyError(name)
+        return stage
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def record(self, name: str) -> StageMetrics:
+        """Return the entry of stage `name`, adding it if the stage has not run yet."""
+        stage = self.get(name)
+        if stage is None:
+            stage = StageMetrics(name)
+            self.stages.append(stage)
+        return stage
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block as stage `name`; the caller fills in the record counts."""
+        stage = self.record(name)
+
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            stage.seconds += time.perf_counter() - started
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1] - baseline
+                stage.peak_memory_bytes = max(peak, stage.peak_memory_bytes or 0)
+
+    def as_dict(self) -> dict:
+        return {
+            'seconds': self.seconds,
+            'stages': [
+                {**asdict(stage), 'records_per_second': stage.records_per_second}
+                for stage in self.stages
+            ],
+        }
+
+    def summary(self) -> str:
+        """Human readable table of the stages."""
+        lines = [f"{'stage':<12} {'seconds':>9} {'records in':>11} {'records out':>12} {'keys':>9} {'peak MB':>9}"]
+        for stage in self.stages:
+            keys = stage.distinct_keys if stage.distinct_keys is not None else "-"
+            peak = f"{stage.peak_memory_bytes / 2 ** 20:.1f}" if stage.peak_memory_bytes is not None else "-"
+            lines.append(
+                f"{stage.name:<12} {stage.seconds:>9.3f} {stage.records_in:>11} {stage.records_out:>12} {keys:>9} {peak:>9}"
+            )
+        lines.append(f"{'total':<12} {self.seconds:>9.3f}")
+        return "\n".join(lines)
+
+
+def timed_records(records, stage: StageMetrics):
+    """
+    Pass `records` through, adding the time spent producing them to `stage`.
+
+    Used for lazily evaluated stages, such as the map stage consumed by the
+    shuffle, whose work happens inside the consumer's loop.
+    """
+    clock = time.perf_counter
+    iterator = iter(records)
+    while True:
+        started = clock()
+        try:
+            record = next(iterator)
+        except StopIteration:
+            stage.seconds += clock() - started
+            return
+        stage.seconds += clock() - started
+        stage.records_out += 1
+        yield record
@@ -7,3 +7,9 @@ def sum_reducer(key, values):
         return 0
     # Ensure values is a list of integers or floats 
     return sum(values)
+
+
+# Equivalent pandas aggregation, used by the engine's columnar mode
+sum_reducer.aggregate = "sum"
+# Sums of partial sums are sums, so the reducer doubles as its own combiner
+sum_reducer.combiner = sum_reducer
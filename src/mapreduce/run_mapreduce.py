@@ -1,14 +1,34 @@
 # src/mapreduce/run_job.py - Add these job functions
+import os
+import numpy as np
+import pandas as pd
 
-def run_demand_analysis_job(data_source):
+# Rows read at a time when streaming a CSV file through the engine
+DEFAULT_CHUNKSIZE = 100_000
+
+# Daily demand per context, read by the training pipeline
+OUTPUT_PATH = "dataset/data_processed/demand_processed.parquet"
+DEMAND_COLUMNS = ["Date", "Country", "Description", "Quantity"]
+
+
+def run_demand_analysis_job(data_source, workers=1, chunksize=DEFAULT_CHUNKSIZE, hooks=(), trace_memory=False,
+                            with_metrics=False):
     """
     Run complete demand analysis by context (Date, Context, Description).
     
     Args:
-        data_source: CSV file path or DataFrame with demand data
+        data_source: CSV file path, DataFrame or iterable of DataFrame chunks
+            with demand data. CSV files are streamed in chunks, so only one
+            chunk and the per-key totals are held in memory.
+        workers: Number of worker processes (None for one per core)
+        chunksize: Rows per chunk when streaming a CSV file
+        hooks: Callables receiving the job's stage metrics when it finishes
+        trace_memory: Record the peak memory of each stage
+        with_metrics: Also return the stage metrics (see mapreduce/metrics.py)
         
     Returns:
-        Dictionary with total quantities by context
+        Dictionary with total quantities by context, or (results, JobMetrics)
+        with `with_metrics`
     """
     print("=== Running Demand Analysis by Context (Date, Country, Description) ===")
     
@@ -16,48 +36,117 @@ def run_demand_analysis_job(data_source):
     from mapper import demand_context_mapper
     from reducer import sum_reducer
     
-    engine = MapReduceEngine(demand_context_mapper, sum_reducer)
-    results = engine.execute(data_source)
+    engine = MapReduceEngine(demand_context_mapper, sum_reducer, workers=workers, hooks=hooks,
+                             trace_memory=trace_memory)
+
+    if isinstance(data_source, (str, os.PathLike)):
+        columns = [*demand_context_mapper.key_columns, demand_context_mapper.value_column]
+        data_source = pd.read_csv(data_source, usecols=columns, chunksize=chunksize)
+
+    if isinstance(data_source, pd.DataFrame):
+        results = engine.execute(data_source)
+    else:
+        results = engine.execute_stream(data_source)
     
-    return results
+    return (results, engine.metrics) if with_metrics else results
 
 
+def _datetimes(dates):
+    """datetime64 column of the dates of the result keys."""
+    try:
+        # Timestamps from parsed input: read their nanoseconds instead of parsing every one
+        values = np.fromiter((date.value for date in dates), dtype=np.int64, count=len(dates))
+    except AttributeError:
+        # Dates still as text, e.g. from a streamed CSV file
+        return pd.to_datetime(pd.Series(dates))
+    return pd.Series(values.view('datetime64[ns]'))
+
+
+def demand_frame(results):
+    """
+    Typed table of the results of run_demand_analysis_job.
+
+    Returns:
+        pd.DataFrame: Date as datetime64, Country and Description as categoricals
+            and Quantity, one row per (date, context) key
+    """
+    if not results:
+        return pd.DataFrame({
+            'Date': pd.Series(dtype='datetime64[ns]'),
+            'Country': pd.Series(dtype='category'),
+            'Description': pd.Series(dtype='category'),
+            'Quantity': pd.Series(dtype='int64'),
+        })
+    dates, contexts = zip(*results)
+    countries, descriptions = zip(*contexts)
+    return pd.DataFrame({
+        'Date': _datetimes(dates),
+        'Country': pd.Categorical(countries),
+        'Description': pd.Categorical(descriptions),
+        'Quantity': pd.Series(list(results.values())),
+    })[DEMAND_COLUMNS]
+
+
+def write_demand_table(results, path=OUTPUT_PATH):
+    """
+    Write the results of run_demand_analysis_job to a Parquet file.
+
+    Country and Description are dictionary-encoded, so each name is stored once,
+    and dates keep their type; readers need no per-row parsing.
+    """
+    df = demand_frame(results)
+    tmp_path = f"{path}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return df
 
 
 if __name__ == "__main__":
+    import argparse
     import sys
-    import pandas as pd
-    import os
+    import tracemalloc
 
-    if len(sys.argv) < 2:
-        print("Usage: python run_mapreduce.py <data_source>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Aggregate raw invoices into daily demand per context")
+    parser.add_argument("data_source", help="CSV or Excel file with the raw invoices")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes, 0 for one per core (default: 1)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help=f"rows read at a time from CSV input (default: {DEFAULT_CHUNKSIZE})")
+    parser.add_argument("--metrics", action="store_true",
+                        help="print time, records, keys and peak memory of every stage")
+    args = parser.parse_args()
 
-    data_source = sys.argv[1]
+    data_source = args.data_source
     _, ext = os.path.splitext(data_source)
     ext = ext.lower()
 
     if ext == ".csv":
-        df = pd.read_csv(data_source)
+        # CSV input is streamed in chunks and never loaded whole
+        source = data_source
     elif ext in [".xlsx", ".xls"]:
-        df = pd.read_excel(data_source)
+        source = pd.read_excel(data_source)
     else:
         print(f"Unsupported file type: {ext}")
         sys.exit(1)
 
-    results = run_demand_analysis_job(df)
+    if args.metrics:
+        # Traced for the whole run so the output stage gets a peak memory too
+        tracemalloc.start()
+    results, metrics = run_demand_analysis_job(
+        source, workers=args.workers or None, chunksize=args.chunksize, trace_memory=args.metrics, with_metrics=True
+    )
 
-    # Save results to dataset/data_processed/ as CSV with columns ["Date", "context", "Quantity"]
-    output_dir = "dataset/data_processed"
-    os.makedirs(output_dir, exist_ok=True)
-    output_path = os.path.join(output_dir, "demand_processed.csv")
+    # Save results to dataset/data_processed/ with columns Date, Country, Description and Quantity
+    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
 
-    # Each key in results is (date, context), value is quantity
-    results_df = pd.DataFrame(
-        [(date, context, quantity) for (date, context), quantity in results.items()],
-        columns=["Date", "context", "Quantity"]
-    )
-    results_df.to_csv(output_path, index=False)
-    print(f"\nResults saved to {output_path}")
+    with metrics.stage("output") as stage:
+        results_df = write_demand_table(results, OUTPUT_PATH)
+        stage.records_in = len(results)
+        stage.records_out = len(results_df)
+    metrics.seconds += stage.seconds
+    print(f"\nResults saved to {OUTPUT_PATH}")
+
+    if args.metrics:
+        print("\n" + metrics.summary())
 
 
@@ -0,0 +1,225 @@
+"""
+Vectorized baseline forecasting models.
+
+Every model is fitted to all contexts at once. Series are the rows of a
+(contexts x days) matrix, left-aligned and padded past their own length, and
+the recursions loop over days while operating on whole columns. Each series is
+split into train and test parts the way fit_predict_arima splits it, so the
+test RMSE of a baseline can be compared with ARIMA's.
+
+    seasonal_naive   repeats the last season of the training data
+    ses              simple exponential smoothing, smoothing factor picked per
+                     context from a grid by in-sample one-step error
+    croston          Croston's method for intermittent demand: smoothed
+                     non-zero demand size over smoothed interval between demands
+"""
+from typing import List, NamedTuple, Sequence
+
+import numpy as np
+
+from forecast_models import Z_95
+
+BASELINE_MODELS = ('seasonal_naive', 'ses', 'croston')
+
+
+class BaselineForecasts(NamedTuple):
+    """Test-period forecasts of the best baseline of each context."""
+    model: np.ndarray           # (contexts,) name of the chosen model
+    rmse: np.ndarray            # (contexts,) its test RMSE
+    forecast: np.ndarray        # (contexts x horizon), NaN past each test length
+    lower: np.ndarray
+    upper: np.ndarray
+    train_lengths: np.ndarray   # (contexts,)
+    test_lengths: np.ndarray    # (contexts,)
+    rmse_by_model: dict         # model name -> (contexts,) test RMSE
+
+
+def pad_series(series: Sequence[np.ndarray]):
+    """Stack 1-D arrays into a left-aligned, zero padded matrix; returns (matrix, lengths)."""
+    lengths = np.array([len(s) for s in series], dtype=np.int64)
+    values = np.zeros((len(series), lengths.max(initial=0)), dtype=np.float64)
+    for i, s in enumerate(series):
+        values[i, :len(s)] = s
+    return values, lengths
+
+
+def _seasonal_naive(values, train_lengths, horizon, season_length):
+    contexts = np.arange(len(values))[:, None]
+    steps = np.arange(horizon)[None, :]
+    n = train_lengths[:, None]
+
+    # Last full season of the training data, repeated; shorter series repeat their last value
+    has_season = n >= season_length
+    source = np.where(has_season, n - season_length + steps % season_length, n - 1)
+    forecast = values[contexts, np.clip(source, 0, None)]
+
+    # One-season-ahead in-sample errors y[t] - y[t - season]
+    t = np.arange(values.shape[1])[None, :]
+    errors = np.zeros_like(values)
+    errors[:, season_length:] = values[:, season_length:] - values[:, :-season_length]
+    valid = (t >= season_length) & (t < n)
+    sigma = _error_scale(errors, valid)
+    widths = sigma[:, None] * np.sqrt(steps // season_length + 1)
+    return forecast, widths
+
+
+def _ses(values, train_lengths, horizon, alphas):
+    alphas = np.asarray(alphas, dtype=np.float64)[:, None]
+    level = np.repeat(values[None, :, 0], len(alphas), axis=0)
+    sse = np.zeros_like(level)
+
+    for t in range(1, int(train_lengths.max(initial=1))):
+        active = t < train_lengths
+        error = values[:, t] - level
+        sse += np.where(active, error ** 2, 0.0)
+        level = np.where(active, level + alphas * error, level)
+
+    # Smoothing factor with the smallest in-sample one-step error, per context
+    best = np.argmin(sse, axis=0)
+    contexts = np.arange(values.shape[0])
+    alpha = alphas[best, 0]
+    sigma = np.sqrt(sse[best, contexts] / np.maximum(train_lengths - 1, 1))
+
+    steps = np.arange(horizon)[None, :]
+    forecast = np.repeat(level[best, contexts][:, None], horizon, axis=1)
+    widths = sigma[:, None] * np.sqrt(1 + steps * alpha[:, None] ** 2)
+    return forecast, widths, alpha
+
+
+def _croston(values, train_lengths, horizon, alpha):
+    contexts = len(values)
+    size = np.full(contexts, np.nan)
+    interval = np.full(contexts, np.nan)
+    last_demand = np.full(contexts, -1)
+    sse = np.zeros(contexts)
+
+    for t in range(int(train_lengths.max(initial=0))):
+        active = t < train_lengths
+        forecast = np.where(np.isnan(size), 0.0, size / interval)
+        sse += np.where(active, (values[:, t] - forecast) ** 2, 0.0)
+
+        demand = active & (values[:, t] != 0)
+        first = demand & np.isnan(size)
+        update = demand & ~first
+        gap = t - last_demand
+        size = np.where(first, values[:, t], np.where(update, size + alpha * (values[:, t] - size), size))
+        interval = np.where(first, t + 1, np.where(update, interval + alpha * (gap - interval), interval))
+        last_demand = np.where(demand, t, last_demand)
+
+    level = np.where(np.isnan(size), 0.0, size / interval)
+    sigma = np.sqrt(sse / np.maximum(train_lengths, 1))
+    steps = np.arange(horizon)[None, :]
+    forecast = np.repeat(level[:, None], horizon, axis=1)
+    widths = sigma[:, None] * np.sqrt(1 + steps * alpha ** 2)
+    return forecast, widths
+
+
+def _error_scale(errors, valid):
+    count = valid.sum(axis=1)
+    return np.sqrt(np.where(valid, errors ** 2, 0.0).sum(axis=1) / np.maximum(count, 1))
+
+
+def fit_predict_baselines(values, lengths, train_size=0.8, season_length=7,
+                          alphas=(0.05, 0.1, 0.2, 0.3, 0.5), croston_alpha=0.1) -> BaselineForecasts:
+    """
+    Fit every baseline to every series and keep the best one per series.
+
+    Args:
+        values: (contexts x days) matrix of left-aligned series
+        lengths: Length of each series
+        train_size: Share of each series used for fitting; the rest is forecast
+            and scored, as in fit_predict_arima
+        season_length: Period of the seasonal naive model, in days
+        alphas: Smoothing factors tried by exponential smoothing
+        croston_alpha: Smoothing factor of Croston's method
+
+    Returns:
+        BaselineForecasts: forecasts, 95% intervals and test RMSE of the best model
+    """
+    values = np.asarray(values, dtype=np.float64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    train_lengths = (lengths * train_size).astype(np.int64)
+    test_lengths = lengths - train_lengths
+    horizon = int(test_lengths.max(initial=0))
+
+    # Training data only: values past each training length must not leak into the fit
+    t = np.arange(values.shape[1])[None, :]
+    train_values = np.where(t < train_lengths[:, None], values, 0.0)
+
+    steps = np.arange(horizon)[None, :]
+    in_test = steps < test_lengths[:, None]
+    actual_positions = np.clip(train_lengths[:, None] + steps, 0, max(values.shape[1] - 1, 0))
+    actual = np.take_along_axis(values, actual_positions, axis=1) if values.size else np.zeros((len(values), 0))
+
+    fits = {
+        'seasonal_naive': _seasonal_naive(train_values, train_lengths, horizon, season_length),
+        'ses': _ses(train_values, train_lengths, horizon, alphas)[:2],
+        'croston': _croston(train_values, train_lengths, horizon, croston_alpha),
+    }
+
+    rmse_by_model = {}
+    for name, (forecast, _) in fits.items():
+        squared = np.where(in_test, (forecast - actual) ** 2, 0.0)
+        rmse_by_model[name] = np.sqrt(squared.sum(axis=1) / np.maximum(test_lengths, 1))
+
+    names = list(fits)
+    scores = np.stack([rmse_by_model[name] for name in names])
+    best = np.argmin(scores, axis=0)
+    contexts = np.arange(len(values))
+
+    forecast = np.stack([fits[name][0] for name in names])[best, contexts]
+    widths = np.stack([fits[name][1] for name in names])[best, contexts]
+    forecast = np.where(in_test, forecast, np.nan)
+    widths = np.where(in_test, widths, np.nan)
+
+    return BaselineForecasts(
+        model=np.array(names, dtype=object)[best],
+        rmse=scores[best, contexts],
+        forecast=forecast,
+        lower=forecast - Z_95 * widths,
+        upper=forecast + Z_95 * widths,
+        train_lengths=train_lengths,
+        test_lengths=test_lengths,
+        rmse_by_model=rmse_by_model,
+    )
+
+
+def fit_baseline_forecasters(values, lengths, models, last_dates, season_length=7,
+                             alphas=(0.05, 0.1, 0.2, 0.3, 0.5), croston_alpha=0.1) -> List[dict]:
+    """
+    Fit a named baseline to the whole of each series, to forecast past its end.
+
+    Args:
+        values: (contexts x days) matrix of left-aligned series
+        lengths: Length of each series
+        models: Baseline of each series, e.g. the `model` of fit_predict_baselines
+        last_dates: Date of the last value of each series
+        season_length, alphas, croston_alpha: As for fit_predict_baselines
+
+    Returns:
+        list: Compact model of each series (see forecast_models.py)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    t = np.arange(values.shape[1])[None, :]
+    values = np.where(t < lengths[:, None], values, 0.0)
+
+    seasons, season_widths = _seasonal_naive(values, lengths, season_length, season_length)
+    ses_level, ses_widths, ses_alpha = _ses(values, lengths, 1, alphas)
+    croston_level, croston_widths = _croston(values, lengths, 1, croston_alpha)
+
+    forecasters = []
+    for i, (model, last_date) in enumerate(zip(models, last_dates)):
+        forecaster = {'kind': model, 'last_date': str(np.datetime64(last_date, 'D'))}
+        if model == 'seasonal_naive':
+            forecaster.update(season=seasons[i].tolist(), season_length=season_length,
+                              sigma=float(season_widths[i, 0]))
+        elif model == 'ses':
+            forecaster.update(level=float(ses_level[i, 0]), alpha=float(ses_alpha[i]), sigma=float(ses_widths[i, 0]))
+        elif model == 'croston':
+            forecaster.update(level=float(croston_level[i, 0]), alpha=float(croston_alpha),
+                              sigma=float(croston_widths[i, 0]))
+        else:
+            raise ValueError(f"Unknown baseline model: {model}")
+        forecasters.append(forecaster)
+    return forecasters
@@ -1,33 +1,215 @@
+import numpy as np
 import pandas as pd
 from ast import literal_eval
+from collections.abc import Mapping
 from statsmodels.tsa.stattools import adfuller
 from statsmodels.tsa.seasonal import seasonal_decompose
-from pmdarima import auto_arima
+from pmdarima import ARIMA, auto_arima
 from sklearn.metrics import mean_squared_error
-import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import NamedTuple, Optional
+import argparse
+import csv
+import hashlib
+import json
 import os
+import signal
+import time
 import warnings
 
+from baseline_models import fit_baseline_forecasters, fit_predict_baselines, pad_series
+from forecast_models import arima_model
+from forecast_artifact import (
+    ARTIFACT_COLUMNS,
+    artifact_exists,
+    iter_artifact_forecasts,
+    read_forecast_artifact,
+    write_forecast_artifact,
+)
+
 warnings.filterwarnings("ignore")
 
+# Daily demand per context written by run_mapreduce.py: Date, Country and
+# Description (categorical) and Quantity
+DATA_PATH = "dataset/data_processed/demand_processed.parquet"
+# Earlier output of run_mapreduce.py, with the context as a stringified tuple
+LEGACY_DATA_PATH = "dataset/data_processed/demand_processed.csv"
+# Consolidated forecasts of every context, see forecast_artifact.py
+OUTPUT_ARTIFACT_DIR = "src/models/forecast_artifact"
+# Forecast rows appended as contexts finish, consolidated into the artifact at the end
+SPOOL_FILE = os.path.join(OUTPUT_ARTIFACT_DIR, "forecasts.spool.csv")
+# Contexts completed by the current run, one JSON line each, to resume it after a crash
+CHECKPOINT_FILE = os.path.join(OUTPUT_ARTIFACT_DIR, "training.checkpoint.jsonl")
+# Seconds between syncs of the spool and checkpoint to disk
+CHECKPOINT_SYNC_INTERVAL = 5.0
+OUTPUT_DECOMP_DIR = "src/models/demand_decompositions"
+# Decomposition components of every context, in one columnar file
+DECOMPOSITIONS_FILE = os.path.join(OUTPUT_DECOMP_DIR, "decompositions.parquet")
+DECOMPOSITION_COLUMNS = ['observed', 'trend', 'seasonal', 'resid']
+OUTPUT_METRICS_FILE = "src/models/performance_metrics/demand_performance.csv"
+# Fingerprints of the series and settings behind each forecast in the artifact
+MANIFEST_FILE = "src/models/demand_predictions_manifest.json"
+
+# Contexts with a shorter daily history are not modelled
+MIN_SERIES_LENGTH = 60
+
+# Settings that change the forecasts; part of every context's fingerprint.
+# 'backend' names the entry of MODEL_BACKENDS used to fit the contexts.
+MODEL_SETTINGS = {
+    'model': 'auto_arima',
+    'backend': 'arima',
+    'train_size': 0.8,
+    # Days forecast past the end of the history when no horizon is asked for
+    'steps': 30,
+    'seasonal': False,
+    'stepwise': True,
+    # Baseline models (see baseline_models.py)
+    'season_length': 7,
+    # The auto backend only tries ARIMA on contexts with fewer zero-demand days than this share
+    'intermittent_share': 0.5,
+    # Models of differenced series forecast quantities, integrated from the last
+    # quantity before the test window or the future; artifacts written before
+    # stored differences, or level baselines, and are refitted
+    'differenced_forecasts': 'integrated',
+}
+
+# A context whose series changed refits the ARIMA order found by its last full
+# search, starting from the stored parameters. The order is searched again when
+# that fit's test RMSE exceeds the search's RMSE by more than this share...
+WARM_START_TOLERANCE = 0.2
+# ...or when the last search is this many days old
+SEARCH_REFRESH_DAYS = 7
+
+
+class TrainingResult(NamedTuple):
+    """Outcome of fitting one context, as yielded by the model backends."""
+    forecast: pd.DataFrame
+    rmse: float
+    components: pd.DataFrame
+    model: str
+    # ARIMA order and parameters to warm-start the next fit from, if any
+    state: Optional[dict] = None
+    # Compact model forecasting past the end of the series (see forecast_models.py)
+    forecaster: Optional[dict] = None
+
+
+class TrainingTimeout(BaseException):
+    """
+    Raised when a context exceeds its training time budget.
+
+    Derives from BaseException so the per-model error handling inside
+    auto_arima's stepwise search cannot swallow it.
+    """
+
 
 def load_data(filepath):
+    """
+    Load the processed demand table.
+
+    Returns:
+        pd.DataFrame: Date, Country and Description as categoricals, and Quantity
+    """
+    if not str(filepath).endswith(".csv"):
+        return pd.read_parquet(filepath, columns=['Date', 'Country', 'Description', 'Quantity'])
+
+    # Legacy CSV output: parse each distinct context string once instead of once per row
     df = pd.read_csv(filepath)
     df['Date'] = pd.to_datetime(df['Date'])
-    df['context'] = df['context'].apply(safe_literal_eval)
-    return df
+    codes, uniques = pd.factorize(df.pop('context'))
+    for position, column in enumerate(['Country', 'Description']):
+        names = np.empty(len(uniques) + 1, dtype=object)
+        for i, value in enumerate(uniques):
+            context = safe_literal_eval(value)
+            names[i] = context[position] if isinstance(context, tuple) else np.nan
+        names[-1] = np.nan  # code -1 marks a missing context
+        df[column] = pd.Categorical(names[codes])
+    return df[['Date', 'Country', 'Description', 'Quantity']]
+
+
+def context_codes(df):
+    """
+    Context code of every row and the (country, description) contexts, sorted.
+
+    Works on the category codes of the Country and Description columns, so no
+    per-row tuple is built.
+    """
+    countries = df['Country'].astype('category').cat
+    descriptions = df['Description'].astype('category').cat
+    n_descriptions = len(descriptions.categories)
+    pairs = countries.codes.to_numpy(np.int64) * n_descriptions + descriptions.codes.to_numpy(np.int64)
+    uniques, codes = np.unique(pairs, return_inverse=True)
+
+    contexts = list(zip(countries.categories[uniques // n_descriptions],
+                        descriptions.categories[uniques % n_descriptions]))
+    order = sorted(range(len(contexts)), key=contexts.__getitem__)
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return rank[codes], [contexts[i] for i in order]
+
+
+class ContextSeries(Mapping):
+    """
+    Daily demand of every context, stored as one dense (contexts x days) matrix.
+
+    Behaves like a dict of context -> daily Series. Each series spans its
+    context's first to last day, as resample('D') would produce, and is built on
+    access from a view of the matrix row rather than a copy.
+    """
+
+    def __init__(self, contexts, dates, values, starts, stops):
+        self.contexts = list(contexts)
+        self.dates = dates
+        self.values = values
+        self.starts = starts
+        self.stops = stops
+        self._positions = {context: i for i, context in enumerate(self.contexts)}
+
+    def __getitem__(self, context):
+        i = self._positions[context]
+        start, stop = self.starts[i], self.stops[i]
+        return pd.Series(self.values[i, start:stop], index=self.dates[start:stop], name='Quantity', copy=False)
+
+    def __iter__(self):
+        return iter(self.contexts)
+
+    def __len__(self):
+        return len(self.contexts)
+
+    def length(self, context):
+        i = self._positions[context]
+        return int(self.stops[i] - self.starts[i])
 
 
 def prepare_time_series(df):
-    grouped = df.groupby('context')
-    context_series = {}
+    df = df[df['Country'].notna() & df['Description'].notna() & df['Date'].notna()]
+    codes, contexts = context_codes(df)
+    days = df['Date'].dt.floor('D')
 
-    for context, group in grouped:
-        ts = group.sort_values('Date').set_index('Date')['Quantity']
-        ts = ts.resample('D').sum().fillna(0)
-        context_series[context] = ts
+    if len(df) == 0:
+        empty = np.zeros(0, dtype=int)
+        return ContextSeries([], pd.DatetimeIndex([], freq='D', name='Date'), np.zeros((0, 0)), empty, empty)
 
-    return context_series
+    dates = pd.date_range(days.min(), days.max(), freq='D', name='Date')
+    day_positions = ((days - dates[0]) // pd.Timedelta(days=1)).to_numpy()
+
+    # One pass sums every (context, day) cell of the dense matrix
+    n_contexts, n_days = len(contexts), len(dates)
+    quantities = df['Quantity'].to_numpy()
+    if np.issubdtype(quantities.dtype, np.floating):
+        quantities = np.nan_to_num(quantities)
+    values = np.bincount(
+        codes * n_days + day_positions, weights=quantities, minlength=n_contexts * n_days
+    ).reshape(n_contexts, n_days)
+    if np.issubdtype(quantities.dtype, np.integer):
+        values = values.astype(quantities.dtype)
+
+    spans = pd.Series(day_positions).groupby(codes).agg(['min', 'max'])
+    starts = spans['min'].to_numpy()
+    stops = spans['max'].to_numpy() + 1
+
+    return ContextSeries(contexts, dates, values, starts, stops)
 
 
 def test_stationarity(ts):
@@ -35,78 +217,648 @@ def test_stationarity(ts):
     return result[1] < 0.05  # Stationary if p-value < 0.05
 
 
-def decompose_series(ts, context, output_dir):
+def decompose_series(ts):
+    """Return the additive weekly decomposition of a series as compact float32 columns."""
     result = seasonal_decompose(ts, model='additive', period=7)
-    result.plot()
-    plt.suptitle(f"Decomposition for {context}", fontsize=12)
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, f"decomposition_{context[0]}_{context[1][:10]}.png"))
-    plt.close()
+    return pd.DataFrame({
+        'Date': ts.index,
+        'observed': result.observed.to_numpy(dtype='float32'),
+        'trend': result.trend.to_numpy(dtype='float32'),
+        'seasonal': result.seasonal.to_numpy(dtype='float32'),
+        'resid': result.resid.to_numpy(dtype='float32'),
+    })
+
+
+def write_decompositions(components, path=DECOMPOSITIONS_FILE, reused=()):
+    """
+    Write the decompositions of all contexts to a single Parquet file.
+
+    `components` maps context -> frame from decompose_series. Rows of the
+    contexts in `reused` are carried over from the existing file.
+    """
+    frames = []
+    if reused and os.path.isfile(path):
+        previous = pd.read_parquet(path)
+        keys = pd.MultiIndex.from_arrays([previous['Country'].astype(str), previous['Description'].astype(str)])
+        frames.append(previous[keys.isin(list(reused))])
+
+    for (country, description), frame in components.items():
+        frames.append(frame.assign(Country=country, Description=description))
 
+    columns = ['Country', 'Description', 'Date'] + DECOMPOSITION_COLUMNS
+    df = pd.concat(frames, ignore_index=True)[columns] if frames else pd.DataFrame(columns=columns)
+    df['Country'] = df['Country'].astype('category')
+    df['Description'] = df['Description'].astype('category')
 
-def fit_predict_arima(ts, train_size=0.8, steps=30):
-    stationary = test_stationarity(ts)
-    if not stationary:
-        ts = ts.diff().dropna()
+    tmp_path = f"{path}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
 
-    split_idx = int(len(ts) * train_size)
-    train, test = ts[:split_idx], ts[split_idx:]
 
-    model = auto_arima(train, seasonal=False, stepwise=True, suppress_warnings=True)
+def render_decompositions(contexts, path=DECOMPOSITIONS_FILE, output_dir=OUTPUT_DECOMP_DIR):
+    """Render decomposition PNGs for the given contexts from the stored components."""
+    # Plotting is the only user of matplotlib, so it stays out of the training path
+    import matplotlib.pyplot as plt
+
+    os.makedirs(output_dir, exist_ok=True)
+    df = pd.read_parquet(path)
+    rendered = []
+    for context in contexts:
+        rows = df[(df['Country'] == context[0]) & (df['Description'] == context[1])]
+        if rows.empty:
+            print(f"⚠️ No decomposition stored for {context}")
+            continue
+
+        fig, axes = plt.subplots(len(DECOMPOSITION_COLUMNS), 1, sharex=True)
+        for ax, column in zip(axes, DECOMPOSITION_COLUMNS):
+            ax.plot(rows['Date'], rows[column])
+            ax.set_ylabel(column.capitalize())
+        fig.suptitle(f"Decomposition for {context}", fontsize=12)
+        fig.tight_layout()
+
+        filename = os.path.join(output_dir, f"decomposition_{context[0]}_{context[1][:10]}.png")
+        fig.savefig(filename)
+        plt.close(fig)
+        rendered.append(filename)
+    return rendered
+
+
+def model_target(ts):
+    """Series the models are fitted to: the series itself, or its first difference if not stationary."""
+    if not test_stationarity(ts):
+        return ts.diff().dropna()
+    return ts
+
+
+def level_forecasts(ts, pred_df):
+    """
+    Test-window forecasts of a model fitted to the differences of `ts`, as quantities.
+
+    Forecast differences are accumulated from the last quantity before the
+    window, and the actual differences are replaced by the actual quantities.
+    The half-widths of the intervals add up in quadrature, as if the errors of
+    successive differences were independent.
+    """
+    if pred_df.empty:
+        return pred_df
+    origin = float(ts.iloc[ts.index.get_loc(pred_df['Date'].iloc[0]) - 1])
+    forecast = origin + pred_df['Forecasted_Quantity'].cumsum()
+    half_width = np.sqrt((((pred_df['Upper_Bound'] - pred_df['Lower_Bound']) / 2) ** 2).cumsum())
+    return pred_df.assign(
+        Forecasted_Quantity=forecast,
+        Lower_Bound=forecast - half_width,
+        Upper_Bound=forecast + half_width,
+        Actual=ts.loc[pred_df['Date']].to_numpy(),
+    )
+
+
+def arima_state(model, differenced, searched_at, search_rmse):
+    """What is persisted of a fitted ARIMA model to warm-start the next fit."""
+    return {
+        'order': list(model.order),
+        'seasonal_order': list(model.seasonal_order),
+        'with_intercept': bool(model.with_intercept),
+        'params': [float(p) for p in model.params()],
+        'differenced': differenced,
+        'searched_at': searched_at,
+        'search_rmse': float(search_rmse),
+    }
+
+
+def fit_arima_order(train, state):
+    """Fit the order stored in `state` directly, starting from its parameters."""
+    model = ARIMA(
+        order=tuple(state['order']),
+        seasonal_order=tuple(state['seasonal_order']),
+        with_intercept=state['with_intercept'],
+        suppress_warnings=True
+    )
+    return model.fit(train, start_params=np.asarray(state['params']))
+
+
+def fit_predict_arima(ts, train_size=0.8, warm_start=None):
+    """
+    Fit ARIMA to the first `train_size` of a series and forecast the rest.
+
+    The order is found by a stepwise auto_arima search. With `warm_start`, the
+    state returned by an earlier fit, its order is fitted directly instead;
+    the search still runs if that fit fails, if the series' stationarity
+    changed, or if the test RMSE degrades past WARM_START_TOLERANCE.
+
+    Returns:
+        forecast, conf_int, model, test, rmse and the model state to persist
+    """
+    target = model_target(ts)
+    differenced = len(target) != len(ts)
+
+    split_idx = int(len(target) * train_size)
+    train, test = target[:split_idx], target[split_idx:]
+
+    if warm_start is not None and warm_start['differenced'] == differenced:
+        try:
+            model = fit_arima_order(train, warm_start)
+            forecast, conf_int = model.predict(n_periods=len(test), return_conf_int=True, alpha=0.05)
+            rmse = mean_squared_error(test, forecast, squared=False)
+        except Exception:
+            rmse = None
+        if rmse is not None and rmse <= warm_start['search_rmse'] * (1 + WARM_START_TOLERANCE):
+            state = arima_state(model, differenced, warm_start['searched_at'], warm_start['search_rmse'])
+            return forecast, conf_int, model, test, rmse, state
+
+    model = auto_arima(
+        train,
+        seasonal=MODEL_SETTINGS['seasonal'],
+        stepwise=MODEL_SETTINGS['stepwise'],
+        suppress_warnings=True
+    )
     forecast, conf_int = model.predict(n_periods=len(test), return_conf_int=True, alpha=0.05)
     rmse = mean_squared_error(test, forecast, squared=False)
-    return forecast, conf_int, model, test, rmse
+    return forecast, conf_int, model, test, rmse, arima_state(model, differenced, date.today().isoformat(), rmse)
+
+
+def arima_forecaster(model, ts, differenced):
+    """
+    Compact model of a fitted ARIMA, forecasting the days after `ts`.
+
+    The parameters fitted to the training part are applied to the whole
+    series, without refitting, so the forecasts start from its last values.
+    Differencing applied before fitting is folded into the model, which
+    therefore forecasts quantities.
+    """
+    target = ts.diff().dropna() if differenced else ts
+    results = model.arima_res_.apply(target.to_numpy(dtype='float64'))
+    params = dict(zip(results.model.param_names, results.params))
+    return arima_model(
+        np.convolve(results.polynomial_ar, results.polynomial_seasonal_ar),
+        np.convolve(results.polynomial_ma, results.polynomial_seasonal_ma),
+        intercept=params.get('intercept', 0.0),
+        sigma2=params['sigma2'],
+        series=ts.to_numpy(dtype='float64'),
+        residuals=results.resid,
+        last_date=ts.index[-1].date(),
+        diff=results.model.k_diff + differenced,
+        seasonal_diff=results.model.k_seasonal_diff,
+        season_length=results.model.seasonal_periods or 0,
+    )
+
+
+@contextmanager
+def time_limit(seconds):
+    """Raise TrainingTimeout if the block runs longer than `seconds` (no-op without SIGALRM)."""
+    if not seconds or not hasattr(signal, "SIGALRM"):
+        yield
+        return
+
+    def on_timeout(signum, frame):
+        raise TrainingTimeout(f"timed out after {seconds}s")
+
+    previous = signal.signal(signal.SIGALRM, on_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def context_name(context):
+    return f"{context[0]}_{context[1]}"
 
 
-def main():
-    DATA_PATH = "dataset/data_processed/demand_processed.csv"
-    OUTPUT_PREDICTIONS_DIR = "src/models/demand_predictions"
-    OUTPUT_DECOMP_DIR = "src/models/demand_decompositions"
-    OUTPUT_METRICS_FILE = "src/models/performance_metrics/demand_performance.csv"
+def series_fingerprint(ts, settings=MODEL_SETTINGS):
+    """Hash a resampled series together with the model settings used to fit it."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    digest.update(str(ts.index[0]).encode() if len(ts) else b"")
+    digest.update(ts.to_numpy(dtype="float64").tobytes())
+    return digest.hexdigest()
 
-    os.makedirs(OUTPUT_PREDICTIONS_DIR, exist_ok=True)
+
+def load_manifest(path=MANIFEST_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    # Write to a temporary file first so a crash never leaves a truncated manifest
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def read_checkpoint(path=CHECKPOINT_FILE):
+    """
+    Return (record, offset of the end of its line) for every record of a
+    checkpoint file; a line cut short by a crash ends the records.
+    """
+    records, offset = [], 0
+    try:
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                offset += len(line)
+                records.append((record, offset))
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def resume_checkpoint(fingerprints, path=CHECKPOINT_FILE, spool_path=SPOOL_FILE):
+    """
+    Contexts completed by an interrupted run, as {context: checkpoint record}.
+
+    Each record holds a context's manifest entry, compact model and the length
+    of the spool once its forecast was written. The run is resumed only when
+    every recorded context still has the fingerprint it was trained with in
+    `fingerprints`; the checkpoint and spool are then truncated to the records
+    fully on disk, so that appending continues the interrupted run.
+    """
+    try:
+        spool_length = os.path.getsize(spool_path)
+    except FileNotFoundError:
+        return {}
+    # Records whose forecast did not reach the disk before the crash are dropped
+    records = [(r, end) for r, end in read_checkpoint(path) if r['spool_offset'] <= spool_length]
+    if not records or any(fingerprints.get(tuple(r['context'])) != r['entry']['fingerprint'] for r, _ in records):
+        return {}
+
+    last, end = records[-1]
+    with open(path, "r+b") as f:
+        f.truncate(end)
+    with open(spool_path, "r+b") as f:
+        f.truncate(last['spool_offset'])
+    return {tuple(r['context']): r for r, _ in records}
+
+
+def _sync(*files):
+    for f in files:
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_spool(path=SPOOL_FILE):
+    """Yield ((country, product), forecast frame) for every context in a spool file."""
+    spool = pd.read_csv(
+        path,
+        dtype={'Country': str, 'Description': str},
+        keep_default_na=False,
+        na_values={column: [''] for column in ARTIFACT_COLUMNS},
+        parse_dates=['Date'],
+    )
+    for context, frame in spool.groupby(['Country', 'Description'], sort=False):
+        yield context, frame.reset_index(drop=True)
+
+
+def train_context(context, ts, timeout=None, warm_start=None):
+    """
+    Decompose, fit and forecast a single context.
+
+    Runs in a worker process when training in parallel, so it only returns the
+    forecast frame, RMSE and decomposition components and leaves writing them
+    to the caller.
+    """
+    print(f"→ Processing context: {context}")
+    with time_limit(timeout):
+        components = decompose_series(ts)
+        forecast, conf_int, model, test, rmse, state = fit_predict_arima(
+            ts, train_size=MODEL_SETTINGS['train_size'], warm_start=warm_start
+        )
+        forecaster = arima_forecaster(model, ts, state['differenced'])
+
+    dates = test.index
+    pred_df = pd.DataFrame({
+        'Date': dates,
+        'Forecasted_Quantity': forecast,
+        'Lower_Bound': conf_int[:, 0],
+        'Upper_Bound': conf_int[:, 1],
+        'Actual': test.values
+    })
+    if state['differenced']:
+        # Served next to the forecaster's quantities, so stored as quantities too
+        pred_df = level_forecasts(ts, pred_df)
+    return TrainingResult(pred_df, rmse, components, 'arima', state, forecaster)
+
+
+def iter_trained_contexts(series_dict, workers=1, timeout=None, warm_starts=None):
+    """
+    Train every context long enough to model and yield (context, result, error)
+    as each one finishes, in completion order.
+
+    With more than one worker, contexts are fanned out to a process pool.
+    `timeout` is a per-context budget in seconds. `warm_starts` maps contexts
+    to the ARIMA state of their previous fit (see fit_predict_arima).
+    """
+    jobs = [(context, ts) for context, ts in series_dict.items() if len(ts) >= MIN_SERIES_LENGTH]
+    warm_starts = warm_starts or {}
+
+    if workers == 1:
+        for context, ts in jobs:
+            try:
+                yield context, train_context(context, ts, timeout, warm_starts.get(context)), None
+            except (Exception, TrainingTimeout) as e:
+                yield context, None, e
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(train_context, context, ts, timeout, warm_starts.get(context)): context
+            for context, ts in jobs
+        }
+        for future in as_completed(futures):
+            context = futures[future]
+            try:
+                yield context, future.result(), None
+            except (Exception, TrainingTimeout) as e:
+                yield context, None, e
+
+
+def _prepare_baseline_context(job):
+    context, ts = job
+    try:
+        return model_target(ts), decompose_series(ts), None
+    except Exception as e:
+        return None, None, e
+
+
+def iter_baseline_contexts(series_dict, workers=1, timeout=None, warm_starts=None):
+    """
+    Fit the vectorized baseline models to every context at once and yield
+    (context, result, error) like iter_trained_contexts.
+
+    Each context gets the baseline with the lowest test RMSE (see
+    baseline_models.py). Only the stationarity test and the decomposition run
+    per context, in a process pool with more than one worker. `timeout` and
+    `warm_starts` are accepted for symmetry with the other backends and not used.
+    """
+    jobs = [(context, ts) for context, ts in series_dict.items() if len(ts) >= MIN_SERIES_LENGTH]
+    if workers == 1:
+        prepared = list(map(_prepare_baseline_context, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            prepared = list(pool.map(_prepare_baseline_context, jobs, chunksize=max(len(jobs) // (workers * 4), 1)))
+
+    fitted = []
+    for (context, ts), (target, components, error) in zip(jobs, prepared):
+        if error is not None:
+            yield context, None, error
+        else:
+            fitted.append((context, ts, target, components))
+    if not fitted:
+        return
+
+    values, lengths = pad_series([target.to_numpy(dtype='float64') for _, _, target, _ in fitted])
+    result = fit_predict_baselines(
+        values, lengths, train_size=MODEL_SETTINGS['train_size'], season_length=MODEL_SETTINGS['season_length']
+    )
+
+    # The forecasters are fitted to the series the baselines were chosen on;
+    # those of differenced series are integrated from their last quantity
+    forecasters = fit_baseline_forecasters(
+        values, lengths, result.model, [ts.index[-1].date() for _, ts, _, _ in fitted],
+        season_length=MODEL_SETTINGS['season_length']
+    )
+
+    for i, (context, ts, target, components) in enumerate(fitted):
+        split, horizon = result.train_lengths[i], result.test_lengths[i]
+        pred_df = pd.DataFrame({
+            'Date': target.index[split:],
+            'Forecasted_Quantity': result.forecast[i, :horizon],
+            'Lower_Bound': result.lower[i, :horizon],
+            'Upper_Bound': result.upper[i, :horizon],
+            'Actual': target.to_numpy()[split:]
+        })
+        if len(target) != len(ts):
+            pred_df = level_forecasts(ts, pred_df)
+            forecasters[i]['origin'] = float(ts.iloc[-1])
+        yield context, TrainingResult(
+            pred_df, float(result.rmse[i]), components, result.model[i], forecaster=forecasters[i]
+        ), None
+
+
+def zero_share(ts):
+    """Share of days without demand."""
+    return float((ts.to_numpy() == 0).mean()) if len(ts) else 1.0
+
+
+def iter_auto_contexts(series_dict, workers=1, timeout=None, warm_starts=None):
+    """
+    Fit the baselines to every context, then ARIMA to the contexts whose demand
+    is not intermittent, and yield whichever model has the lower test RMSE.
+
+    Both models are scored on the same target and split, so their RMSE are
+    comparable. A context whose ARIMA fit fails or times out keeps its baseline;
+    one whose baseline wins still keeps its ARIMA state for the next warm start.
+    """
+    baselines = {}
+    for context, result, error in iter_baseline_contexts(series_dict, workers, timeout):
+        if error is not None:
+            yield context, None, error
+        else:
+            baselines[context] = result
+
+    regular = {
+        context: series_dict[context] for context in baselines
+        if zero_share(series_dict[context]) < MODEL_SETTINGS['intermittent_share']
+    }
+    for context, result in baselines.items():
+        if context not in regular:
+            yield context, result, None
+
+    for context, result, error in iter_trained_contexts(regular, workers, timeout, warm_starts):
+        baseline = baselines[context]
+        if error is not None:
+            yield context, baseline, None
+        elif baseline.rmse <= result.rmse:
+            yield context, baseline._replace(state=result.state), None
+        else:
+            yield context, result, None
+
+
+# Model backends selectable through MODEL_SETTINGS['backend']. A backend takes
+# ({context: series}, workers, timeout, warm_starts) and yields (context,
+# TrainingResult, error) as contexts finish.
+MODEL_BACKENDS = {
+    'arima': iter_trained_contexts,
+    'baseline': iter_baseline_contexts,
+    'auto': iter_auto_contexts,
+}
+
+
+def main(workers=None, context_timeout=None, full_refit=False, backend=None, full_search=False, resume=True):
+    """
+    Train and forecast every context.
+
+    Contexts whose series and model settings match the fingerprint recorded in
+    MANIFEST_FILE by a previous run keep their forecast and are not refit.
+    Contexts that are refit warm-start from the ARIMA order and parameters the
+    manifest recorded for them, unless their last order search is older than
+    SEARCH_REFRESH_DAYS.
+
+    Each context is checkpointed to CHECKPOINT_FILE as it finishes. A run
+    started after an interrupted one resumes from its checkpoint and only
+    trains the contexts it had not completed.
+
+    Args:
+        workers: Number of worker processes (None for one per core)
+        context_timeout: Seconds allowed per context before it is abandoned
+        full_refit: Refit every context, ignoring the manifest
+        backend: Name of the model backend, see MODEL_BACKENDS (default:
+            MODEL_SETTINGS['backend'])
+        full_search: Search the ARIMA order of every refit context again
+        resume: Resume an interrupted run from its checkpoint; when False, an
+            existing checkpoint is discarded
+
+    Returns:
+        Dictionary with the number of contexts refit, reused and failed
+    """
+    workers = workers or os.cpu_count() or 1
+    settings = dict(MODEL_SETTINGS, backend=backend or MODEL_SETTINGS['backend'])
+    fit_contexts = MODEL_BACKENDS[settings['backend']]
+
+    os.makedirs(OUTPUT_ARTIFACT_DIR, exist_ok=True)
     os.makedirs(OUTPUT_DECOMP_DIR, exist_ok=True)
-    os.makedirs("src/models", exist_ok=True)
+    os.makedirs(os.path.dirname(OUTPUT_METRICS_FILE), exist_ok=True)
 
     print("🔄 Loading data...")
-    df = load_data(DATA_PATH)
+    df = load_data(DATA_PATH if os.path.exists(DATA_PATH) or not os.path.exists(LEGACY_DATA_PATH)
+                   else LEGACY_DATA_PATH)
 
     print("🔄 Preparing time series per context...")
     series_dict = prepare_time_series(df)
 
-    print("📈 Training ARIMA models and forecasting...")
-    metrics = []
+    previous_artifact = read_forecast_artifact(OUTPUT_ARTIFACT_DIR) if artifact_exists(OUTPUT_ARTIFACT_DIR) else None
+    previous_contexts = set()
+    if previous_artifact is not None:
+        previous_contexts = {(c['country'], c['product']) for c in previous_artifact.contexts}
 
-    for context, ts in series_dict.items():
-        if len(ts) < 60:
-            continue
+    stored_manifest = load_manifest()
+    previous_manifest = {} if full_refit else stored_manifest
+    fingerprints = {
+        context: series_fingerprint(ts, settings) for context, ts in series_dict.items()
+        if len(ts) >= MIN_SERIES_LENGTH
+    }
+    resumed = resume_checkpoint(fingerprints) if resume else {}
 
-        try:
-            print(f"→ Processing context: {context}")
-            decompose_series(ts, context, OUTPUT_DECOMP_DIR)
-            forecast, conf_int, model, test, rmse = fit_predict_arima(ts, steps=30)
+    manifest = {}
+    reused = []
+    to_train = {}
+    for context, fingerprint in fingerprints.items():
+        name = context_name(context)
+        previous = previous_manifest.get(name)
+        if context in resumed:
+            manifest[name] = resumed[context]['entry']
+        elif previous is not None and previous['fingerprint'] == fingerprint and context in previous_contexts:
+            manifest[name] = previous
+            reused.append(context)
+        else:
+            to_train[context] = (series_dict[context], fingerprint)
+
+    warm_starts = {}
+    if not full_search:
+        oldest_search = (date.today() - timedelta(days=SEARCH_REFRESH_DAYS)).isoformat()
+        for context in to_train:
+            state = stored_manifest.get(context_name(context), {}).get('arima')
+            if state is not None and state['searched_at'] >= oldest_search:
+                warm_starts[context] = state
+
+    summary = {'refit': len(resumed), 'reused': len(reused), 'failed': 0}
+    print(f"📈 Training {settings['backend']} models for {len(to_train)} context(s) with {workers} worker(s), "
+          f"reusing {summary['reused']} unchanged, resuming {len(resumed)} from the checkpoint, "
+          f"warm-starting {len(warm_starts)}...")
 
-            dates = test.index
-            pred_df = pd.DataFrame({
-                'Date': dates,
-                'Forecasted_Quantity': forecast,
-                'Lower_Bound': conf_int[:, 0],
-                'Upper_Bound': conf_int[:, 1],
-                'Actual': test.values
-            })
-            filename = f"{context[0]}_{context[1][:10]}_forecast.csv".replace(' ', '_')
-            pred_df.to_csv(os.path.join(OUTPUT_PREDICTIONS_DIR, filename), index=False)
+    # Forecasts, metrics and checkpoint records are written as each context
+    # finishes, so an interrupted run keeps everything completed so far
+    components = {}
+    # Compact models of the reused contexts are carried over from the previous artifact
+    reused_set = set(reused)
+    models = {context: record['model'] for context, record in resumed.items() if record['model'] is not None}
+    if previous_artifact is not None:
+        models.update({
+            (c['country'], c['product']): c['model'] for c in previous_artifact.contexts
+            if 'model' in c and (c['country'], c['product']) in reused_set
+        })
+    mode = "a" if resumed else "w"
+    with open(OUTPUT_METRICS_FILE, "w", newline="") as metrics_file, \
+            open(SPOOL_FILE, mode, newline="") as spool_file, \
+            open(CHECKPOINT_FILE, mode) as checkpoint_file:
+        metrics_writer = csv.writer(metrics_file)
+        metrics_writer.writerow(['Context', 'RMSE', 'Model'])
+        for name, entry in manifest.items():
+            metrics_writer.writerow([name, entry['rmse'], entry.get('model', 'arima')])
+        metrics_file.flush()
 
-            metrics.append({
-                'Context': f"{context[0]}_{context[1]}",
-                'RMSE': rmse
-            })
+        spool_columns = ['Country', 'Description', 'Date'] + ARTIFACT_COLUMNS
+        if not resumed:
+            csv.writer(spool_file).writerow(spool_columns)
 
-        except Exception as e:
-            print(f"⚠️ Erreur pour {context}: {e}")
+        synced_at = time.monotonic()
+        series_to_train = {context: ts for context, (ts, _) in to_train.items()}
+        for context, result, error in fit_contexts(series_to_train, workers, context_timeout, warm_starts):
+            if error is not None:
+                print(f"⚠️ Erreur pour {context}: {error}")
+                summary['failed'] += 1
+                continue
 
-    # Save performance metrics
-    pd.DataFrame(metrics).to_csv(OUTPUT_METRICS_FILE, index=False)
+            pred_df, rmse, components[context], model, state, models[context] = result
+            pred_df.assign(Country=context[0], Description=context[1])[spool_columns].to_csv(
+                spool_file, header=False, index=False
+            )
+            spool_file.flush()
+
+            metrics_writer.writerow([context_name(context), rmse, model])
+            metrics_file.flush()
+
+            entry = {
+                'fingerprint': to_train[context][1],
+                'rmse': float(rmse),
+                'model': model,
+            }
+            if state is not None:
+                entry['arima'] = state
+            manifest[context_name(context)] = entry
+            summary['refit'] += 1
+
+            # The checkpoint is written after the forecast, so it never records
+            # a context whose forecast is not in the spool
+            checkpoint_file.write(json.dumps({
+                'context': list(context),
+                'entry': entry,
+                'model': models[context],
+                'spool_offset': spool_file.tell(),
+            }) + "\n")
+            checkpoint_file.flush()
+            if time.monotonic() - synced_at >= CHECKPOINT_SYNC_INTERVAL:
+                _sync(spool_file, checkpoint_file)
+                synced_at = time.monotonic()
+
+    # Decompositions of the resumed contexts are cheap to recompute
+    for context in resumed:
+        components[context] = decompose_series(series_dict[context])
+
+    # Consolidate the reused and the new forecasts into a single artifact
+    forecasts = []
+    if previous_artifact is not None:
+        forecasts = [item for item in iter_artifact_forecasts(previous_artifact) if item[0] in reused_set]
+    forecasts.extend(read_spool(SPOOL_FILE))
+    version = write_forecast_artifact(forecasts, OUTPUT_ARTIFACT_DIR, models=models, horizon=settings['steps'])
+
+    write_decompositions(components, DECOMPOSITIONS_FILE, reused=reused)
+    save_manifest(manifest)
+    # The run is complete once the artifact and the manifest are written
+    os.remove(CHECKPOINT_FILE)
+    os.remove(SPOOL_FILE)
+    print(f"✅ {summary['refit']} context(s) refit, {summary['reused']} reused, {summary['failed']} failed "
+          f"(forecast artifact {version})")
+    return summary
 
 
 def safe_literal_eval(val):
@@ -117,4 +869,29 @@ def safe_literal_eval(val):
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Train demand models for every context")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes (default: one per core)")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="seconds allowed per context before it is skipped")
+    parser.add_argument("--full-refit", action="store_true",
+                        help="refit every context even if its series has not changed")
+    parser.add_argument("--full-search", action="store_true",
+                        help="search the ARIMA order of every refit context instead of warm-starting "
+                             "from the order stored by the previous run")
+    parser.add_argument("--backend", choices=sorted(MODEL_BACKENDS), default=MODEL_SETTINGS['backend'],
+                        help="arima fits auto_arima per context, baseline fits fast vectorized models to all "
+                             "contexts at once, auto picks the lower test RMSE of both per context "
+                             f"(default: {MODEL_SETTINGS['backend']})")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="start over instead of resuming an interrupted run from its checkpoint")
+    parser.add_argument("--plot", nargs=2, action="append", metavar=("COUNTRY", "PRODUCT"),
+                        help="render the stored decomposition of a context instead of training (repeatable)")
+    args = parser.parse_args()
+
+    if args.plot:
+        for filename in render_decompositions([tuple(context) for context in args.plot]):
+            print(f"🖼️ Saved {filename}")
+    else:
+        main(workers=args.workers, context_timeout=args.timeout, full_refit=args.full_refit, backend=args.backend,
+             full_search=args.full_search, resume=not args.no_resume)
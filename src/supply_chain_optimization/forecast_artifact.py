@@ -0,0 +1,134 @@
+"""
+Consolidated forecast artifact shared by the training pipeline and the API.
+
+All forecasts live in one directory instead of one CSV per context:
+
+    values-<version>.npy   float64 (rows x 4): Forecasted_Quantity, Lower_Bound,
+                           Upper_Bound, Actual
+    dates-<version>.npy    datetime64[D] (rows,): forecast date of each row
+    index.json             version, array filenames, the default forecast horizon
+                           in days and, per context, its country, product,
+                           [start, stop) row range and compact model (see
+                           forecast_models.py), sorted by country then product
+
+Both arrays can be memory-mapped, so readers never parse the forecasts. Only
+numpy is needed to read the artifact. Array files are named after the version
+and index.json is swapped in last, so a new artifact replaces the old one
+atomically.
+"""
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+INDEX_FILE = "index.json"
+
+ARTIFACT_COLUMNS = ['Forecasted_Quantity', 'Lower_Bound', 'Upper_Bound', 'Actual']
+
+
+class ForecastArtifact(NamedTuple):
+    version: str
+    contexts: List[Dict]
+    dates: np.ndarray
+    values: np.ndarray
+    horizon: Optional[int] = None
+
+
+def write_forecast_artifact(forecasts: Iterable[Tuple[Tuple[str, str], "pd.DataFrame"]], output_dir,
+                            models: Optional[Dict[Tuple[str, str], Dict]] = None, horizon: Optional[int] = None):
+    """
+    Write ((country, product), forecast frame) pairs as one artifact.
+
+    Each frame needs a Date column and the ARTIFACT_COLUMNS. `models` maps
+    contexts to the compact model forecasting past the end of their history,
+    and `horizon` is the number of days to forecast when none is asked for.
+    Returns the version of the new artifact.
+    """
+    models = models or {}
+    os.makedirs(output_dir, exist_ok=True)
+
+    contexts, dates, values = [], [], []
+    start = 0
+    for (country, product), frame in sorted(forecasts, key=lambda item: item[0]):
+        stop = start + len(frame)
+        entry = {'country': country, 'product': product, 'start': start, 'stop': stop}
+        if (country, product) in models:
+            entry['model'] = models[(country, product)]
+        contexts.append(entry)
+        dates.append(np.asarray(frame['Date'], dtype='datetime64[D]'))
+        values.append(frame[ARTIFACT_COLUMNS].to_numpy(dtype='float64'))
+        start = stop
+
+    dates = np.concatenate(dates) if dates else np.zeros(0, dtype='datetime64[D]')
+    values = np.concatenate(values) if values else np.zeros((0, len(ARTIFACT_COLUMNS)))
+
+    digest = hashlib.sha256()
+    digest.update(dates.tobytes())
+    digest.update(values.tobytes())
+    digest.update(json.dumps([contexts, horizon]).encode())
+    version = digest.hexdigest()[:16]
+    index = {
+        'version': version,
+        'rows': len(values),
+        'horizon': horizon,
+        'columns': ARTIFACT_COLUMNS,
+        'values_file': f"values-{version}.npy",
+        'dates_file': f"dates-{version}.npy",
+        'contexts': contexts,
+    }
+
+    for name, array in ((index['values_file'], values), (index['dates_file'], dates)):
+        # Saved under a temporary name and moved into place, so a reader mapping
+        # an identical earlier artifact never sees a half-written file
+        tmp_path = os.path.join(output_dir, f"{name}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, os.path.join(output_dir, name))
+
+    tmp_path = os.path.join(output_dir, f"{INDEX_FILE}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, os.path.join(output_dir, INDEX_FILE))
+
+    # Readers that still map the previous arrays keep them alive until they reload
+    for name in os.listdir(output_dir):
+        if name.endswith(".npy") and name not in (index['values_file'], index['dates_file']):
+            os.remove(os.path.join(output_dir, name))
+    return version
+
+
+def artifact_exists(artifact_dir) -> bool:
+    return os.path.isfile(os.path.join(artifact_dir, INDEX_FILE))
+
+
+def artifact_signature(artifact_dir):
+    """Cheap signature of the artifact's index file, None if there is no artifact."""
+    try:
+        st = os.stat(os.path.join(artifact_dir, INDEX_FILE))
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def read_forecast_artifact(artifact_dir, mmap_mode="r") -> ForecastArtifact:
+    """Open an artifact; the arrays are memory-mapped unless mmap_mode is None."""
+    with open(os.path.join(artifact_dir, INDEX_FILE)) as f:
+        index = json.load(f)
+    values = np.load(os.path.join(artifact_dir, index['values_file']), mmap_mode=mmap_mode)
+    dates = np.load(os.path.join(artifact_dir, index['dates_file']), mmap_mode=mmap_mode)
+    if len(values) != index['rows'] or len(dates) != index['rows']:
+        raise ValueError(f"Forecast artifact in {artifact_dir} is corrupt")
+    return ForecastArtifact(index['version'], index['contexts'], dates, values, index.get('horizon'))
+
+
+def iter_artifact_forecasts(artifact: ForecastArtifact):
+    """Yield ((country, product), forecast frame) for every context of an artifact."""
+    import pandas as pd
+
+    for context in artifact.contexts:
+        rows = slice(context['start'], context['stop'])
+        frame = pd.DataFrame(np.asarray(artifact.values[rows]), columns=ARTIFACT_COLUMNS)
+        frame.insert(0, 'Date', pd.to_datetime(artifact.dates[rows].astype('datetime64[ns]')))
+        yield (context['country'], context['product']), frame
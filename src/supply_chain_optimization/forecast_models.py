@@ -0,0 +1,142 @@
+"""
+Compact forecasting models shared by the training pipeline and the API.
+
+Training stores, per context, the handful of numbers needed to forecast past
+the end of its history, so any horizon can be forecast later without the
+fitting libraries and without refitting. A model is a JSON-serializable dict
+with a `kind`, the `last_date` of the history it was fitted to and:
+
+    arima            ar, ma: lag coefficients of the model written on the
+                     undifferenced series, y[t] = intercept + sum(ar[i] * y[t-1-i])
+                     + e[t] + sum(ma[j] * e[t-1-j]); all differencing is folded
+                     into `ar`. history: the last len(ar) values, residuals:
+                     the last len(ma) one-step errors, sigma2: error variance
+    seasonal_naive   season: the last season, repeated; season_length; sigma
+    ses, croston     level: the flat forecast; alpha: smoothing factor; sigma
+
+A baseline fitted to the day-over-day differences of a series also has an
+`origin`, the last quantity of the history: its forecasts are accumulated from
+it, and the half-widths of its intervals add up in quadrature.
+
+Only numpy is needed to forecast. Intervals are 95% prediction intervals, as
+for the forecasts of the artifact.
+"""
+from typing import NamedTuple, Sequence
+
+import numpy as np
+
+# z-score of the two-sided 95% prediction interval
+Z_95 = 1.959963984540054
+
+
+class HorizonForecast(NamedTuple):
+    dates: np.ndarray       # datetime64[D], the days after the model's last date
+    forecast: np.ndarray
+    lower: np.ndarray
+    upper: np.ndarray
+
+
+def _lag_coefficients(polynomial: np.ndarray) -> list:
+    return [float(c) for c in polynomial[1:]]
+
+
+def arima_model(ar_polynomial: Sequence[float], ma_polynomial: Sequence[float], intercept: float, sigma2: float,
+                series: Sequence[float], residuals: Sequence[float], last_date, diff: int = 0,
+                seasonal_diff: int = 0, season_length: int = 0) -> dict:
+    """
+    Compact ARIMA model from its lag polynomials.
+
+    Args:
+        ar_polynomial: AR lag polynomial in increasing powers, [1, -phi_1, ...],
+            seasonal terms included
+        ma_polynomial: MA lag polynomial in increasing powers, [1, theta_1, ...]
+        intercept: Constant of the differenced equation
+        sigma2: Variance of the errors
+        series: Undifferenced history, at least its last few values
+        residuals: One-step errors of the fitted model, aligned with the end of `series`
+        last_date: Date of the last value of `series`
+        diff: Order of differencing, including any applied before fitting
+        seasonal_diff: Order of seasonal differencing
+        season_length: Period of the seasonal differencing
+    """
+    ar = np.asarray(ar_polynomial, dtype=np.float64)
+    for _ in range(diff):
+        ar = np.convolve(ar, [1.0, -1.0])
+    if seasonal_diff:
+        seasonal = np.zeros(season_length + 1)
+        seasonal[[0, -1]] = [1.0, -1.0]
+        for _ in range(seasonal_diff):
+            ar = np.convolve(ar, seasonal)
+    ma = np.asarray(ma_polynomial, dtype=np.float64)
+
+    p, q = len(ar) - 1, len(ma) - 1
+    series = np.asarray(series, dtype=np.float64)
+    residuals = np.asarray(residuals, dtype=np.float64)
+    # Short histories are padded, as if the series had been zero before
+    history = np.concatenate([np.zeros(max(p - len(series), 0)), series[-p:] if p else []])
+    errors = np.concatenate([np.zeros(max(q - len(residuals), 0)), residuals[-q:] if q else []])
+    return {
+        'kind': 'arima',
+        'last_date': str(np.datetime64(last_date, 'D')),
+        # Stored with the sign convention of the recursion, not of the polynomial
+        'ar': [-c for c in _lag_coefficients(ar)],
+        'ma': _lag_coefficients(ma),
+        'intercept': float(intercept),
+        'sigma2': float(sigma2),
+        'history': history.tolist(),
+        'residuals': errors.tolist(),
+    }
+
+
+def _arima_forecast(model: dict, steps: int):
+    ar, ma = np.asarray(model['ar']), np.asarray(model['ma'])
+    p, q = len(ar), len(ma)
+    values = np.concatenate([model['history'], np.zeros(steps)])
+    # Future errors are zero
+    errors = np.concatenate([model['residuals'], np.zeros(steps)])
+    for h in range(steps):
+        # Lags are taken most recent first
+        values[p + h] = model['intercept'] + ar @ values[h:p + h][::-1] + ma @ errors[h:q + h][::-1]
+
+    # Variance of the h-step error from the MA(infinity) weights of the recursion
+    psi = np.zeros(steps)
+    if steps:
+        psi[0] = 1.0
+    for k in range(1, steps):
+        m = min(k, p)
+        psi[k] = (ma[k - 1] if k <= q else 0.0) + ar[:m] @ psi[k - m:k][::-1]
+    widths = np.sqrt(model['sigma2'] * np.cumsum(psi ** 2))
+    return values[p:], widths
+
+
+def _seasonal_naive_forecast(model: dict, steps: int):
+    season = np.asarray(model['season'], dtype=np.float64)
+    forecast = np.resize(season, steps)
+    widths = model['sigma'] * np.sqrt(np.arange(steps) // model['season_length'] + 1)
+    return forecast, widths
+
+
+def _level_forecast(model: dict, steps: int):
+    forecast = np.full(steps, model['level'], dtype=np.float64)
+    widths = model['sigma'] * np.sqrt(1 + np.arange(steps) * model['alpha'] ** 2)
+    return forecast, widths
+
+
+_FORECASTERS = {
+    'arima': _arima_forecast,
+    'seasonal_naive': _seasonal_naive_forecast,
+    'ses': _level_forecast,
+    'croston': _level_forecast,
+}
+
+
+def forecast_model(model: dict, steps: int) -> HorizonForecast:
+    """Forecast the `steps` days following the last date of a compact model."""
+    if steps < 0:
+        raise ValueError("steps must not be negative")
+    forecast, widths = _FORECASTERS[model['kind']](model, steps)
+    if 'origin' in model:
+        forecast = model['origin'] + np.cumsum(forecast)
+        widths = np.sqrt(np.cumsum(widths ** 2))
+    dates = np.datetime64(model['last_date'], 'D') + np.arange(1, steps + 1)
+    return HorizonForecast(dates, forecast, forecast - Z_95 * widths, forecast + Z_95 * widths)
@@ -0,0 +1,94 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'supply_chain_optimization')))
+
+from baseline_models import fit_baseline_forecasters, fit_predict_baselines, pad_series
+from forecast_models import forecast_model
+
+
+def ses_reference(y, alpha):
+    level, sse = y[0], 0.0
+    for value in y[1:]:
+        error = value - level
+        sse += error ** 2
+        level += alpha * error
+    return level, sse
+
+
+def croston_reference(y, alpha):
+    size = interval = None
+    last = -1
+    for t, value in enumerate(y):
+        if value != 0:
+            if size is None:
+                size, interval = value, t + 1
+            else:
+                size += alpha * (value - size)
+                interval += alpha * ((t - last) - interval)
+            last = t
+    return 0.0 if size is None else size / interval
+
+
+def rmse(forecast, actual):
+    return np.sqrt(np.mean((forecast - actual) ** 2))
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(1)
+    return [rng.poisson(rng.uniform(0.1, 3.0), rng.integers(60, 120)).astype(float) for _ in range(40)]
+
+
+def test_vectorized_baselines_match_per_series_fits(series):
+    values, lengths = pad_series(series)
+    alphas = (0.1, 0.3)
+    result = fit_predict_baselines(values, lengths, alphas=alphas, croston_alpha=0.1)
+
+    for i, y in enumerate(series):
+        split = int(len(y) * 0.8)
+        train, test = y[:split], y[split:]
+        alpha = min(alphas, key=lambda a: ses_reference(train, a)[1])
+        expected = {
+            'seasonal_naive': rmse(np.array([train[split - 7 + h % 7] for h in range(len(test))]), test),
+            'ses': rmse(ses_reference(train, alpha)[0], test),
+            'croston': rmse(croston_reference(train, 0.1), test),
+        }
+        for model, value in expected.items():
+            assert result.rmse_by_model[model][i] == pytest.approx(value)
+        assert result.rmse[i] == pytest.approx(min(expected.values()))
+        assert result.model[i] == min(expected, key=expected.get)
+
+        horizon = result.test_lengths[i]
+        assert horizon == len(test)
+        assert np.all(result.lower[i, :horizon] <= result.forecast[i, :horizon])
+        assert np.all(result.upper[i, :horizon] >= result.forecast[i, :horizon])
+        assert np.isnan(result.forecast[i, horizon:]).all()
+
+
+def test_padding_does_not_leak_into_the_fit(series):
+    values, lengths = pad_series(series)
+    alone = fit_predict_baselines(*pad_series(series[:1]))
+    together = fit_predict_baselines(values, lengths)
+
+    horizon = alone.test_lengths[0]
+    np.testing.assert_allclose(together.forecast[0, :horizon], alone.forecast[0, :horizon])
+    assert together.rmse[0] == pytest.approx(alone.rmse[0])
+
+
+def test_forecasters_continue_the_fitted_baselines(series):
+    values, lengths = pad_series(series)
+    result = fit_predict_baselines(values, lengths)
+
+    # Forecasters fitted to the training part forecast the test part like the baselines
+    train, train_lengths = pad_series([y[:split] for y, split in zip(series, result.train_lengths)])
+    forecasters = fit_baseline_forecasters(train, train_lengths, result.model, ["2011-01-01"] * len(series))
+    for i, forecaster in enumerate(forecasters):
+        assert forecaster['kind'] == result.model[i]
+        horizon = forecast_model(forecaster, int(result.test_lengths[i]))
+        np.testing.assert_allclose(horizon.forecast, result.forecast[i, :result.test_lengths[i]])
+        np.testing.assert_allclose(horizon.lower, result.lower[i, :result.test_lengths[i]])
+        np.testing.assert_allclose(horizon.upper, result.upper[i, :result.test_lengths[i]])
+        assert str(horizon.dates[0]) == "2011-01-02"
@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+from src.app.services.forecast_store import ForecastStore
+from src.benchmarks.bench_api import make_models_dir, make_payloads
+from src.benchmarks.common import latency_summary
+
+
+@pytest.mark.parametrize("layout", ["artifact", "csv"])
+def test_synthetic_models_dir_is_served(tmp_path, layout):
+    data = make_models_dir(tmp_path, contexts=5, days=40, layout=layout)
+    store = ForecastStore(data['models_dir'], data['artifact_dir'])
+    store.refresh()
+
+    for payload in make_payloads(data['contexts'], days=40, count=20):
+        assert store.get(payload['country'], payload['product_description'], payload['year'], payload['month'])
+
+    misses = make_payloads(data['contexts'], days=40, count=5, miss_rate=1.0)
+    assert not any(store.has_context(p['country'], p['product_description']) for p in misses)
+
+
+def test_latency_summary():
+    summary = latency_summary([0.001] * 98 + [0.010, 0.020], elapsed=0.5, errors=1)
+
+    assert summary['requests'] == 100
+    assert summary['errors'] == 1
+    assert summary['throughput_rps'] == 200.0
+    assert summary['p50_ms'] == 1.0
+    assert summary['max_ms'] == 20.0
+
+
+def test_synthetic_invoices_have_the_raw_data_shape():
+    from src.benchmarks.bench_pipeline import make_invoices
+    from engine import MapReduceEngine
+    from mapper import demand_context_mapper
+    from reducer import sum_reducer
+    from run_mapreduce import demand_frame
+
+    invoices = make_invoices(rows=2000, contexts=30, days=90)
+
+    assert {'InvoiceDate', 'Country', 'Description', 'Quantity'} <= set(invoices.columns)
+    assert len(invoices) == 2000
+    assert invoices[['Country', 'Description']].drop_duplicates().shape[0] <= 30
+    assert invoices['InvoiceDate'].max() - invoices['InvoiceDate'].min() < pd.Timedelta(days=90)
+
+    results = MapReduceEngine(demand_context_mapper, sum_reducer).execute(invoices)
+    processed = demand_frame(results)
+    assert list(processed.columns) == ["Date", "Country", "Description", "Quantity"]
+    assert processed['Quantity'].sum() == invoices['Quantity'].sum()
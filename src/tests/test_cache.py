@@ -0,0 +1,55 @@
+from src.app.services.cache import ResponseCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_counts_hits_and_misses():
+    cache = ResponseCache(maxsize=10, ttl=60)
+    assert cache.get("a") == (False, None)
+    cache.set("a", 1)
+    assert cache.get("a") == (True, 1)
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ResponseCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_entries_expire():
+    clock = FakeClock()
+    cache = ResponseCache(maxsize=10, ttl=5, clock=clock)
+    cache.set("a", 1)
+    clock.now = 4.9
+    assert cache.get("a") == (True, 1)
+    clock.now = 5.1
+    assert cache.get("a") == (False, None)
+    assert len(cache) == 0
+
+
+def test_cache_is_cleared_on_new_version():
+    cache = ResponseCache(maxsize=10, ttl=60)
+    cache.ensure_version("v1")
+    cache.set("a", 1)
+    cache.ensure_version("v1")
+    assert cache.get("a") == (True, 1)
+
+    cache.ensure_version("v2")
+    assert cache.get("a") == (False, None)
+    assert cache.stats()["invalidations"] == 1
@@ -0,0 +1,58 @@
+import pytest
+from src.app.services.catalog import CatalogEntry, ContextCatalog, search_key, split_context_name
+
+
+@pytest.fixture
+def catalog():
+    return ContextCatalog([
+        CatalogEntry("AUSTRALIA_BLUE_DINER_PLATE", "Australia", "BLUE DINER PLATE"),
+        CatalogEntry("FRANCE_JUMBO_BAG_RED", "France", "JUMBO BAG RED"),
+        CatalogEntry("FRANCE_RED_RETROSPOT_CUP", "France", "RED RETROSPOT CUP"),
+        CatalogEntry("UNITED_KINGDOM_JUMBO_BAG_RED", "United Kingdom", "JUMBO BAG RED"),
+    ])
+
+
+def test_search_key_ignores_case_and_punctuation():
+    assert search_key("  blue_diner-plate ") == "BLUE DINER PLATE"
+    assert search_key("SET/6 RED  CUPS") == "SET 6 RED CUPS"
+
+
+def test_catalog_resolves_normalized_names(catalog):
+    assert catalog.resolve("australia", "Blue-Diner  plate") == "AUSTRALIA_BLUE_DINER_PLATE"
+    assert catalog.resolve("united_kingdom", "jumbo bag red") == "UNITED_KINGDOM_JUMBO_BAG_RED"
+    assert catalog.resolve("Australia", "BLUE DINER") is None
+
+
+def test_catalog_searches_by_prefix(catalog):
+    assert [e.context for e in catalog.search("jumbo")] == ["FRANCE_JUMBO_BAG_RED", "UNITED_KINGDOM_JUMBO_BAG_RED"]
+    assert [e.context for e in catalog.search("jumbo", country="united kingdom")] == ["UNITED_KINGDOM_JUMBO_BAG_RED"]
+    # Names starting with the query come before those with a later word matching it
+    assert [e.context for e in catalog.search("red", country="France")] == [
+        "FRANCE_RED_RETROSPOT_CUP", "FRANCE_JUMBO_BAG_RED"
+    ]
+    assert [e.context for e in catalog.search("dine")] == ["AUSTRALIA_BLUE_DINER_PLATE"]
+    assert len(catalog.search("", limit=3)) == 3
+    assert catalog.search("plates") == []
+
+
+def test_catalog_suggests_near_misses(catalog):
+    assert [e.context for e in catalog.suggest("France", "JUMBO BAG RDE")] == ["FRANCE_JUMBO_BAG_RED"]
+    assert catalog.suggest("Australia", "JUMBO BAG RDE") == []
+
+    legacy = ContextCatalog([CatalogEntry("AUSTRALIA_BLUE_DINER", None, None)])
+    assert legacy.resolve("Australia", "blue diner") == "AUSTRALIA_BLUE_DINER"
+    assert [e.context for e in legacy.suggest("Australia", "BLUE DINNER")] == ["AUSTRALIA_BLUE_DINER"]
+
+
+def test_legacy_names_are_split_into_country_and_product():
+    countries = ["Israel", "United Arab Emirates", "United Kingdom", "United"]
+    assert split_context_name("UNITED_KINGDOM_JUMBO_BAG_", countries) == ("United Kingdom", "JUMBO BAG")
+    assert split_context_name("AUSTRALIA_BLUE_DINER", countries) == ("AUSTRALIA", "BLUE DINER")
+
+    names = ["AUSTRALIA_BLUE_DINER", "AUSTRALIA_BAKING_SET", "ISRAEL_BLUE_DINER", "UNITED_KINGDOM_AUSTRIAN_M"]
+    legacy = ContextCatalog(CatalogEntry(name, *split_context_name(name, ["Australia", *countries])) for name in names)
+    assert legacy.resolve("australia", "Blue Diner") == "AUSTRALIA_BLUE_DINER"
+    assert [e.context for e in legacy.search("BLUE", country="Australia")] == ["AUSTRALIA_BLUE_DINER"]
+    # Countries are not matched as products
+    assert [e.context for e in legacy.search("AUS")] == ["UNITED_KINGDOM_AUSTRIAN_M"]
+    assert [e.context for e in legacy.suggest("Australia", "BLUE DINNER")] == ["AUSTRALIA_BLUE_DINER"]
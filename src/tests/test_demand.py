@@ -215,3 +215,233 @@ def test_demand_forecast_invalid_input_type():
     assert response.status_code == 422  # Unprocessable entity
     assert "detail" in response.json()
     assert len(response.json()["detail"]) > 0
+
+def test_demand_forecast_from_forecast_store():
+    """
+    Test a forecast served from the in-memory forecast store
+    """
+    test_data = {
+        "year": 2011,
+        "month": 8,
+        "country": "Australia",
+        "product_description": "BLUE_DINER"
+    }
+
+    response = client.post("/api/v1/forecast/demand", json=test_data)
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["confidence_interval_lower"] <= data["forecast_quantity"] <= data["confidence_interval_upper"]
+
+def test_demand_forecast_batch():
+    """
+    Test a batch request mixing valid and invalid items
+    """
+    test_data = {
+        "requests": [
+            {"year": 2011, "month": 8, "country": "Australia", "product_description": "BLUE_DINER"},
+            {"year": 2011, "month": 8, "country": "InvalidCountry", "product_description": "BLUE_DINER"},
+            {"year": 2011, "month": 13, "country": "Australia", "product_description": "BLUE_DINER"},
+            {"year": 2011, "month": 9, "country": "Australia", "product_description": "BLUE_DINER"}
+        ]
+    }
+
+    response = client.post("/api/v1/forecast/demand/batch", json=test_data)
+    assert response.status_code == 200
+
+    results = response.json()["results"]
+    assert [item["status_code"] for item in results] == [200, 404, 400, 200]
+    assert "No forecast model found" in results[1]["detail"]
+    assert "Month must be between 1 and 12" in results[2]["detail"]
+
+    single = client.post("/api/v1/forecast/demand", json=test_data["requests"][0]).json()
+    assert results[0]["forecast"] == single
+
+def test_demand_forecast_batch_matches_single_route_statuses():
+    """
+    Test that a batch item gets the status the single route returns for it
+    """
+    requests = [
+        {"year": 2011, "month": 13, "country": "InvalidCountry", "product_description": "BLUE_DINER"},
+        {"year": 2011, "month": 8, "country": "InvalidCountry", "product_description": "BLUE_DINER"},
+        {"year": 2011, "month": 0, "country": "Australia", "product_description": "BLUE_DINER"},
+    ]
+    response = client.post("/api/v1/forecast/demand/batch", json={"requests": requests})
+    statuses = [item["status_code"] for item in response.json()["results"]]
+
+    assert statuses == [client.post("/api/v1/forecast/demand", json=r).status_code for r in requests]
+    assert statuses == [400, 404, 400]
+
+def test_demand_forecast_batch_empty():
+    """
+    Test an empty batch request
+    """
+    response = client.post("/api/v1/forecast/demand/batch", json={"requests": []})
+    assert response.status_code == 422
+
+def test_demand_forecast_cache_stats():
+    """
+    Test that repeated requests, including misses, are served from the cache
+    """
+    hit = {"year": 2011, "month": 8, "country": "Australia", "product_description": "BLUE_DINER"}
+    miss = {"year": 2011, "month": 8, "country": "InvalidCountry", "product_description": "BLUE_DINER"}
+
+    for test_data, status_code in ((hit, 200), (miss, 404)):
+        client.post("/api/v1/forecast/demand", json=test_data)
+        before = client.get("/api/v1/forecast/cache/stats").json()
+        response = client.post("/api/v1/forecast/demand", json=test_data)
+        after = client.get("/api/v1/forecast/cache/stats").json()
+
+        assert response.status_code == status_code
+        assert after["hits"] == before["hits"] + 1
+        assert after["misses"] == before["misses"]
+
+
+def test_metrics_endpoint():
+    """
+    Test that request counts, latencies, route phases and cache counters are exposed
+    """
+    test_data = {"year": 2011, "month": 8, "country": "Australia", "product_description": "BLUE_DINER"}
+    client.post("/api/v1/forecast/demand", json=test_data)
+    client.get("/no/such/route")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+    body = response.text
+    assert 'http_requests_total{method="POST",route="/api/v1/forecast/demand",status="200"}' in body
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"}' in body
+    assert 'http_request_duration_seconds_bucket{method="POST",route="/api/v1/forecast/demand",le="+Inf"}' in body
+    for phase in ("parse", "lookup", "serialize"):
+        assert f'http_route_phase_duration_seconds_count{{route="/api/v1/forecast/demand",phase="{phase}"}}' in body
+    assert "forecast_cache_hit_ratio " in body
+
+
+@pytest.fixture
+def store_with_models(tmp_path):
+    """Serve an artifact holding compact models from the app's forecast store."""
+    from src.app.services.forecast_store import forecast_store
+    from src.supply_chain_optimization.forecast_artifact import write_forecast_artifact
+
+    frame = pd.DataFrame({
+        'Date': pd.to_datetime(["2011-12-01"]),
+        'Forecasted_Quantity': [4.0],
+        'Lower_Bound': [3.0],
+        'Upper_Bound': [5.0],
+        'Actual': [4.0],
+    })
+    model = {'kind': 'seasonal_naive', 'last_date': "2011-12-09", 'season': [1.0, 2.0, 3.0],
+             'season_length': 3, 'sigma': 0.5}
+    write_forecast_artifact([(("France", "BAKING SET"), frame)], tmp_path, models={("France", "BAKING SET"): model},
+                            horizon=5)
+
+    artifact_dir = forecast_store.artifact_dir
+    forecast_store.artifact_dir = tmp_path
+    forecast_store.refresh(force=True)
+    yield
+    forecast_store.artifact_dir = artifact_dir
+    forecast_store.refresh(force=True)
+
+
+def test_demand_forecast_horizon(store_with_models):
+    """
+    Test on-demand forecasts past the history from a compact model
+    """
+    request = {"country": "France", "product_description": "BAKING SET"}
+    response = client.post("/api/v1/forecast/demand/horizon", json=request)
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["model"] == "seasonal_naive"
+    assert [point["date"] for point in data["forecasts"]] == [f"2011-12-{day}" for day in range(10, 15)]
+    assert [point["forecast_quantity"] for point in data["forecasts"]] == [1.0, 2.0, 3.0, 1.0, 2.0]
+
+    # Repeated queries are served from the cache
+    from src.app.routes.demand import horizon_cache
+    hits = horizon_cache.hits
+    assert client.post("/api/v1/forecast/demand/horizon", json=request).json() == data
+    assert horizon_cache.hits == hits + 1
+
+    response = client.post("/api/v1/forecast/demand/horizon", json={**request, "steps": 90})
+    assert len(response.json()["forecasts"]) == 90
+
+    for steps in (0, 10_000):
+        response = client.post("/api/v1/forecast/demand/horizon", json={**request, "steps": steps})
+        assert response.status_code == 400
+
+    response = client.post("/api/v1/forecast/demand/horizon", json={**request, "country": "Spain"})
+    assert response.status_code == 404
+
+    # Months after the history are answered by the model too
+    response = client.post("/api/v1/forecast/demand", json={"year": 2012, "month": 1, **request})
+    assert response.status_code == 200
+
+
+def test_demand_forecast_aggregate(store_with_models):
+    """
+    Test aggregate queries over the forecast table
+    """
+    request = {"countries": ["France"], "start_date": "2011-12-01", "end_date": "2011-12-31"}
+    response = client.post("/api/v1/forecast/demand/aggregate", json=request)
+    assert response.status_code == 200
+    assert response.json()["results"] == [{
+        "country": None, "product": None, "month": None,
+        "forecast_quantity": 4.0, "confidence_interval_lower": 3.0, "confidence_interval_upper": 5.0,
+        "days": 1, "contexts": 1,
+    }]
+    # The forecasts past the history are not aggregated, whatever the forecast mode
+    assert response.json()["forecasts_end"] == "2011-12-01"
+
+    response = client.post("/api/v1/forecast/demand/aggregate", json={"group_by": ["country", "month"]})
+    assert [(r["country"], r["month"]) for r in response.json()["results"]] == [("France", "2011-12")]
+
+    response = client.post("/api/v1/forecast/demand/aggregate", json={"group_by": ["week"]})
+    assert response.status_code == 422
+    response = client.post("/api/v1/forecast/demand/aggregate",
+                           json={"start_date": "2011-12-31", "end_date": "2011-12-01"})
+    assert response.status_code == 400
+
+
+
+def test_demand_forecast_aggregate_accepts_the_spellings_of_the_single_route(store_with_models):
+    """
+    Test that aggregate filters match names the way the single route resolves them
+    """
+    for country, product in (("France", "BAKING SET"), ("FRANCE", "baking-set"), ("france", "Baking_Set")):
+        single = {"year": 2011, "month": 12, "country": country, "product_description": product}
+        assert client.post("/api/v1/forecast/demand", json=single).status_code == 200
+
+        request = {"countries": [country], "products": [product]}
+        results = client.post("/api/v1/forecast/demand/aggregate", json=request).json()["results"]
+        assert [r["forecast_quantity"] for r in results] == [4.0]
+
+
+def test_demand_forecast_aggregate_needs_the_artifact():
+    """
+    Test that aggregate queries are refused while serving per-context CSV files,
+    some of which hold day-over-day differences
+    """
+    response = client.post("/api/v1/forecast/demand/aggregate", json={"countries": ["Australia"]})
+    assert response.status_code == 503
+
+
+def test_catalog_search(store_with_models):
+    """
+    Test autocomplete over the known contexts, and suggestions for unknown names
+    """
+    response = client.get("/api/v1/catalog/search", params={"q": "bak", "country": "france"})
+    assert response.status_code == 200
+    assert response.json()["results"] == [{"country": "France", "product": "BAKING SET", "context": "FRANCE_BAKING_SET"}]
+
+    assert client.get("/api/v1/catalog/search", params={"q": "set"}).json()["results"][0]["product"] == "BAKING SET"
+    assert client.get("/api/v1/catalog/search", params={"q": "bak", "country": "Spain"}).json()["results"] == []
+    assert client.get("/api/v1/catalog/search", params={"q": "bak", "limit": 0}).status_code == 422
+
+    # Names differing in case and punctuation resolve to the same context
+    request = {"year": 2011, "month": 12, "country": "FRANCE", "product_description": "baking-set"}
+    assert client.post("/api/v1/forecast/demand", json=request).json()["forecast_quantity"] == 4.0
+
+    response = client.post("/api/v1/forecast/demand", json={**request, "product_description": "BAKNG SET"})
+    assert response.status_code == 404
+    assert "Did you mean: BAKING SET?" in response.json()["detail"]
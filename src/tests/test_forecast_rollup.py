@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.app.services.forecast_rollup import ForecastRollup
+
+CONTEXTS = [
+    ("Australia", "BLUE DINER PLATE"),
+    ("Australia", "JUMBO BAG RED"),
+    ("France", "JUMBO BAG RED"),
+    ("France", "BAKING SET"),
+    ("Spain", "BAKING SET"),
+]
+
+
+@pytest.fixture
+def daily():
+    """Daily forecasts of every context over ragged, overlapping date ranges."""
+    rng = np.random.default_rng(0)
+    frames = []
+    for i, (country, product) in enumerate(CONTEXTS):
+        dates = pd.date_range(pd.Timestamp("2011-06-20") + pd.Timedelta(days=7 * i), periods=100 - 9 * i, freq="D")
+        forecast = rng.gamma(2.0, 3.0, len(dates))
+        half_width = rng.uniform(0.5, 2.0, len(dates))
+        frames.append(pd.DataFrame({
+            'context': i, 'country': country, 'product': product, 'Date': dates,
+            'forecast': forecast, 'lower': forecast - half_width, 'upper': forecast + half_width,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+@pytest.fixture
+def rollup(daily):
+    return ForecastRollup(
+        [c for c, _ in CONTEXTS], [p for _, p in CONTEXTS], daily['context'].to_numpy(),
+        daily['Date'].to_numpy(dtype='datetime64[D]'), daily[['forecast', 'lower', 'upper']].to_numpy()
+    )
+
+
+def reference(daily, countries=None, products=None, start=None, end=None, group_by=(), interval="independent"):
+    rows = daily
+    if countries is not None:
+        rows = rows[rows['country'].isin(countries)]
+    if products is not None:
+        rows = rows[rows['product'].isin(products)]
+    if start is not None:
+        rows = rows[rows['Date'] >= pd.Timestamp(start)]
+    if end is not None:
+        rows = rows[rows['Date'] <= pd.Timestamp(end)]
+    rows = rows.assign(month=rows['Date'].dt.strftime('%Y-%m'), variance=((rows['upper'] - rows['lower']) / 2) ** 2)
+
+    keys = list(group_by) or [np.zeros(len(rows))]
+    results = []
+    for _, group in rows.groupby(keys, sort=True):
+        total = group['forecast'].sum()
+        if interval == "independent":
+            lower, upper = total - np.sqrt(group['variance'].sum()), total + np.sqrt(group['variance'].sum())
+        else:
+            lower, upper = group['lower'].sum(), group['upper'].sum()
+        results.append({
+            **{key: group[key].iloc[0] for key in group_by},
+            'forecast_quantity': total,
+            'confidence_interval_lower': lower,
+            'confidence_interval_upper': upper,
+            'days': len(group),
+            'contexts': group.groupby('month' if 'month' in group_by else np.zeros(len(group)))['context'].nunique().max(),
+        })
+    return results
+
+
+@pytest.mark.parametrize("query", [
+    {},
+    {'countries': ["Australia"], 'start': "2011-07-01", 'end': "2011-09-30"},
+    {'products': ["JUMBO BAG RED"], 'group_by': ["country"]},
+    {'start': "2011-07-13", 'end': "2011-08-02", 'group_by': ["month"]},
+    {'start': "2011-07-13", 'end': "2011-07-20", 'group_by': ["country", "product"], 'interval': "additive"},
+    {'countries': ["France", "Spain"], 'group_by': ["product", "month"]},
+])
+def test_rollup_matches_a_scan_of_the_daily_rows(daily, rollup, query):
+    expected = reference(daily, **query)
+    results = rollup.query(**query)
+
+    key = lambda result: tuple(result.get(k, "") for k in ("country", "product", "month"))
+    assert sorted(map(key, results)) == sorted(map(key, expected))
+    for result, reference_result in zip(sorted(results, key=key), sorted(expected, key=key)):
+        assert result == pytest.approx(reference_result)
+
+
+def test_rollup_names_and_filters(rollup):
+    # Names match the way context keys do
+    total = rollup.query(countries=["australia"], products=["BLUE_DINER_PLATE"])
+    assert total[0]['contexts'] == 1
+
+    assert rollup.query(countries=["Germany"]) == []
+    assert rollup.query(start="2012-01-01") == []
+    with pytest.raises(ValueError):
+        rollup.query(group_by=["week"])
@@ -0,0 +1,277 @@
+import asyncio
+import os
+import time
+import pytest
+import numpy as np
+import pandas as pd
+from src.app.services.forecast_store import ForecastStore, context_key
+from src.supply_chain_optimization.forecast_artifact import write_forecast_artifact
+from src.supply_chain_optimization.forecast_models import forecast_model
+
+
+def write_forecast(models_dir, name, dates, forecasts):
+    df = pd.DataFrame({
+        'Date': dates,
+        'Forecasted_Quantity': forecasts,
+        'Lower_Bound': [f - 1.0 for f in forecasts],
+        'Upper_Bound': [f + 1.0 for f in forecasts],
+        'Actual': [0] * len(forecasts)
+    })
+    path = models_dir / f"{name}_forecast.csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture
+def models_dir(tmp_path):
+    write_forecast(tmp_path, "Australia_BLUE_DINER", ["2011-08-30", "2011-08-31", "2011-09-01"], [3.0, 4.0, 5.0])
+    write_forecast(tmp_path, "United_Kingdom_JUMBO_BAG_", ["2011-10-01"], [7.5])
+    return tmp_path
+
+
+def test_context_key_matches_file_naming():
+    assert context_key("Australia", "blue diner") == "AUSTRALIA_BLUE_DINER"
+    assert context_key("United Kingdom", "JUMBO_BAG_") == "UNITED_KINGDOM_JUMBO_BAG_"
+
+
+def test_store_returns_first_forecast_of_month(models_dir):
+    store = ForecastStore(models_dir)
+    store.refresh()
+
+    assert store.has_context("Australia", "BLUE_DINER")
+    assert store.get("Australia", "BLUE_DINER", 2011, 8).forecast == 3.0
+    assert store.get("Australia", "BLUE_DINER", 2011, 9).upper_ci == 6.0
+    assert store.get("United Kingdom", "JUMBO_BAG_", 2011, 10).lower_ci == 6.5
+    assert store.get("Australia", "BLUE_DINER", 2012, 1) is None
+    assert not store.has_context("Australia", "INVALID_PRODUCT")
+
+
+def test_store_catalogs_legacy_files_by_country(models_dir):
+    store = ForecastStore(models_dir)
+    store.refresh()
+
+    assert [(e.country, e.product) for e in store.search("BLUE", country="Australia")] == [("Australia", "BLUE DINER")]
+    assert [e.context for e in store.search("jumbo", country="united kingdom")] == ["UNITED_KINGDOM_JUMBO_BAG_"]
+    assert store.search("AUS") == []
+
+
+def test_store_reloads_when_directory_changes(models_dir):
+    store = ForecastStore(models_dir, refresh_interval=0)
+    store.refresh()
+    assert not store.has_context("France", "BAKING_SET")
+
+    path = write_forecast(models_dir, "France_BAKING_SET", ["2011-11-01"], [2.0])
+    # Make sure the change is visible even on filesystems with coarse timestamps
+    later = time.time() + 5
+    os.utime(path, (later, later))
+    os.utime(models_dir, (later, later))
+    store.refresh()
+
+    assert store.get("France", "BAKING_SET", 2011, 11).forecast == 2.0
+
+
+def test_store_flags_files_with_missing_columns(models_dir):
+    pd.DataFrame({'Date': ["2011-08-01"], 'Quantity': [1]}).to_csv(
+        models_dir / "Spain_BROKEN_forecast.csv", index=False
+    )
+    store = ForecastStore(models_dir)
+    store.refresh()
+
+    assert store.has_context("Spain", "BROKEN")
+    assert not store.is_valid("Spain", "BROKEN")
+
+
+def test_store_with_missing_directory(tmp_path):
+    store = ForecastStore(tmp_path / "missing")
+    store.refresh()
+    assert len(store) == 0
+
+
+def artifact_frame(dates, forecasts):
+    return pd.DataFrame({
+        'Date': pd.to_datetime(dates),
+        'Forecasted_Quantity': forecasts,
+        'Lower_Bound': [f - 1.0 for f in forecasts],
+        'Upper_Bound': [f + 1.0 for f in forecasts],
+        'Actual': [0.0] * len(forecasts)
+    })
+
+
+@pytest.fixture
+def artifact_dir(tmp_path):
+    forecasts = {
+        ("Australia", "BLUE DINER PLATE"): artifact_frame(["2011-08-30", "2011-08-31", "2011-09-01"], [3.0, 4.0, 5.0]),
+        ("France", "JUMBO BAG RED"): artifact_frame(["2011-10-01"], [1.0]),
+        ("France", "JUMBO BAG RETROSPOT"): artifact_frame(["2011-10-01"], [2.0]),
+    }
+    write_forecast_artifact(forecasts.items(), tmp_path / "artifact")
+    return tmp_path / "artifact"
+
+
+def test_store_serves_the_forecast_artifact(artifact_dir, models_dir):
+    store = ForecastStore(models_dir, artifact_dir)
+    store.refresh()
+
+    assert store.get("Australia", "BLUE DINER PLATE", 2011, 8).forecast == 3.0
+    assert store.get("Australia", "BLUE_DINER_PLATE", 2011, 9).upper_ci == 6.0
+    # Products sharing a ten character prefix no longer collide
+    assert store.get("France", "JUMBO BAG RED", 2011, 10).forecast == 1.0
+    assert store.get("France", "JUMBO BAG RETROSPOT", 2011, 10).forecast == 2.0
+    # The legacy per-context CSVs are not used while an artifact exists
+    assert not store.has_context("United Kingdom", "JUMBO_BAG_")
+
+
+def test_store_keeps_unambiguous_legacy_names(artifact_dir, models_dir):
+    store = ForecastStore(models_dir, artifact_dir)
+    store.refresh()
+
+    assert store.get("Australia", "BLUE_DINER", 2011, 8).forecast == 3.0
+    assert not store.has_context("France", "JUMBO_BAG_")
+
+
+def test_store_resolves_names_from_its_catalog(artifact_dir, models_dir):
+    store = ForecastStore(models_dir, artifact_dir)
+    store.refresh()
+
+    assert store.get("australia", "Blue-Diner Plate", 2011, 8).forecast == 3.0
+    assert [e.product for e in store.search("jumbo", "France")] == ["JUMBO BAG RED", "JUMBO BAG RETROSPOT"]
+    assert store.suggest("France", "JUMBO BAG RETROSPOTS")[0].product == "JUMBO BAG RETROSPOT"
+
+
+def test_stores_share_the_tables_built_from_an_artifact(artifact_dir, models_dir, tmp_path, monkeypatch):
+    first = ForecastStore(models_dir, artifact_dir, shared_dir=tmp_path / "shared")
+    first.refresh()
+
+    def no_build(self, artifact):
+        raise AssertionError("tables are built once per artifact")
+
+    # Another worker process maps the tables the first one built
+    monkeypatch.setattr(ForecastStore, "_build_tables", no_build)
+    second = ForecastStore(models_dir, artifact_dir, shared_dir=tmp_path / "shared")
+    second.refresh()
+
+    assert isinstance(second._snapshot.month_rows, np.memmap)
+    assert second.get("Australia", "BLUE DINER PLATE", 2011, 9) == first.get("Australia", "BLUE DINER PLATE", 2011, 9)
+    assert second.aggregate(countries=["France"]) == first.aggregate(countries=["France"])
+
+
+def test_stores_share_the_tables_of_the_csv_files(models_dir, tmp_path_factory, monkeypatch):
+    # Outside the models directory, whose modification time is part of the signature
+    shared_dir = tmp_path_factory.mktemp("shared")
+    first = ForecastStore(models_dir, shared_dir=shared_dir)
+    first.refresh()
+
+    def no_parse(self, *args):
+        raise AssertionError("the files are parsed once per directory signature")
+
+    # Another worker process maps the tables the first one built
+    monkeypatch.setattr(ForecastStore, "_load_file", no_parse)
+    second = ForecastStore(models_dir, shared_dir=shared_dir)
+    second.refresh()
+
+    assert isinstance(second._snapshot.values, np.memmap)
+    assert second.version == first.version
+    assert second.get("Australia", "BLUE DINER PLATE", 2011, 9) == first.get("Australia", "BLUE DINER PLATE", 2011, 9)
+
+
+def test_store_reloads_a_new_artifact(artifact_dir, models_dir):
+    store = ForecastStore(models_dir, artifact_dir, refresh_interval=0)
+    store.refresh()
+    version = store.version
+
+    write_forecast_artifact([(("Spain", "BAKING SET"), artifact_frame(["2011-11-02"], [9.0]))], artifact_dir)
+    store.refresh()
+
+    assert store.version != version
+    assert store.get("Spain", "BAKING SET", 2011, 11).forecast == 9.0
+    assert not store.has_context("Australia", "BLUE DINER PLATE")
+
+
+def test_async_refresh_serves_current_snapshot_while_reloading(models_dir, monkeypatch):
+    store = ForecastStore(models_dir, refresh_interval=0)
+    store.refresh()
+
+    path = write_forecast(models_dir, "France_BAKING_SET", ["2011-11-01"], [2.0])
+    later = time.time() + 5
+    os.utime(path, (later, later))
+    os.utime(models_dir, (later, later))
+
+    load_csv_files = store._load_csv_files
+    def slow_load(*args):
+        time.sleep(0.5)
+        return load_csv_files(*args)
+    monkeypatch.setattr(store, "_load_csv_files", slow_load)
+
+    async def scenario():
+        started = time.monotonic()
+        await store.arefresh()
+        # The reload runs in a worker thread; the old data is served meanwhile
+        assert time.monotonic() - started < 0.25
+        assert store.get("Australia", "BLUE_DINER", 2011, 8).forecast == 3.0
+        assert not store.has_context("France", "BAKING_SET")
+        await store._background
+
+    asyncio.run(scenario())
+    assert store.get("France", "BAKING_SET", 2011, 11).forecast == 2.0
+
+
+LEVEL_MODEL = {'kind': 'ses', 'last_date': "2011-09-01", 'level': 5.0, 'alpha': 0.2, 'sigma': 1.0}
+
+
+@pytest.fixture
+def artifact_with_models(tmp_path):
+    forecasts = [
+        (("Australia", "BLUE DINER PLATE"), artifact_frame(["2011-08-30", "2011-08-31", "2011-09-01"], [3.0, 4.0, 5.0])),
+        (("France", "JUMBO BAG RED"), artifact_frame(["2011-10-01"], [1.0])),
+    ]
+    models = {("Australia", "BLUE DINER PLATE"): LEVEL_MODEL}
+    write_forecast_artifact(forecasts, tmp_path / "artifact", models=models, horizon=14)
+    return tmp_path / "artifact"
+
+
+@pytest.mark.parametrize("mode", ["on_demand", "batch"])
+def test_store_forecasts_past_the_history(artifact_with_models, tmp_path, mode):
+    store = ForecastStore(tmp_path, artifact_with_models, mode=mode, max_steps=60)
+    store.refresh()
+
+    # Months of the artifact are served from it, later ones from the model
+    assert store.get("Australia", "BLUE DINER PLATE", 2011, 9).forecast == 5.0
+    expected = forecast_model(LEVEL_MODEL, 30)
+    october = store.get("Australia", "BLUE DINER PLATE", 2011, 10)
+    assert october == (5.0, expected.lower[29], expected.upper[29])
+    # Beyond max_steps, or without a model, there is no forecast
+    assert store.get("Australia", "BLUE DINER PLATE", 2011, 12) is None
+    assert store.get("France", "JUMBO BAG RED", 2011, 11) is None
+
+    assert store.horizon == 14
+    assert store.model_kind("Australia", "BLUE DINER PLATE") == "ses"
+    horizon = store.forecast_horizon("Australia", "BLUE DINER PLATE")
+    assert len(horizon.dates) == 14 and str(horizon.dates[0]) == "2011-09-02"
+    assert store.forecast_horizon("France", "JUMBO BAG RED", 7) is None
+    with pytest.raises(ValueError):
+        store.forecast_horizon("Australia", "BLUE DINER PLATE", 61)
+
+
+@pytest.mark.parametrize("mode", ["on_demand", "batch"])
+def test_store_aggregates_the_stored_forecasts(artifact_with_models, tmp_path, mode):
+    store = ForecastStore(tmp_path, artifact_with_models, mode=mode, max_steps=30)
+    store.refresh()
+
+    # Forecasts past the history are left out in either mode
+    assert store.aggregate(countries=["Australia"])[0]['forecast_quantity'] == 12.0
+    months = store.aggregate(countries=["Australia"], group_by=["month"])
+    assert [(m['month'], m['days']) for m in months] == [("2011-08", 2), ("2011-09", 1)]
+    assert str(store.aggregate_end) == "2011-10-01"
+
+    assert ForecastStore(tmp_path).aggregate() is None
+
+
+def test_store_does_not_aggregate_legacy_files(models_dir):
+    # A file of a context modelled on its differences: nothing tells it apart from quantities
+    write_forecast(models_dir, "France_TRENDING_P", ["2011-10-01", "2011-10-02"], [-0.4, 0.3])
+    store = ForecastStore(models_dir)
+    store.refresh()
+
+    assert store.get("France", "TRENDING_P", 2011, 10).forecast == -0.4
+    assert store.aggregate(countries=["France"]) is None
+    assert store.aggregate_end is None
\ No newline at end of file
@@ -0,0 +1,190 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+# The mapreduce modules import each other as top-level modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'mapreduce')))
+
+from engine import MapReduceEngine
+from mapper import demand_context_mapper
+from reducer import sum_reducer
+from run_mapreduce import run_demand_analysis_job, write_demand_table
+
+
+@pytest.fixture
+def invoices():
+    rng = np.random.default_rng(0)
+    n = 500
+    df = pd.DataFrame({
+        'InvoiceDate': rng.choice(['12/1/2010 8:26', '12/1/2010 9:02', '12/2/2010 10:15'], n),
+        'Country': rng.choice(['United Kingdom', 'France', 'Australia'], n),
+        'Description': rng.choice(['BLUE DINER', 'JUMBO BAG', 'BAKING SET', None], n, p=[0.4, 0.3, 0.29, 0.01]),
+        'Quantity': rng.integers(-5, 50, n),
+    })
+    return df
+
+
+@pytest.mark.parametrize("categorical", [False, True])
+def test_columnar_mode_matches_row_mode(invoices, categorical):
+    if categorical:
+        # As written by write_demand_table; unused categories must not become keys
+        invoices = invoices.astype({'Country': 'category', 'Description': 'category'})
+        invoices['Country'] = invoices['Country'].cat.add_categories(['Israel'])
+    row = MapReduceEngine(demand_context_mapper, sum_reducer, mode="row").execute(invoices)
+    columnar = MapReduceEngine(demand_context_mapper, sum_reducer, mode="columnar").execute(invoices)
+
+    assert columnar == row
+    assert all(type(value) is int for value in columnar.values())
+
+
+def test_auto_mode_falls_back_to_rows_for_plain_mappers(invoices):
+    def quantity_by_country(row):
+        return [(row["Country"], row["Quantity"])]
+
+    results = MapReduceEngine(quantity_by_country, sum_reducer).execute(invoices)
+    expected = invoices.groupby('Country')['Quantity'].sum().to_dict()
+    assert results == expected
+
+    with pytest.raises(ValueError):
+        MapReduceEngine(quantity_by_country, sum_reducer, mode="columnar").execute(invoices)
+
+
+def test_run_demand_analysis_job(invoices):
+    results = run_demand_analysis_job(invoices)
+    assert results == MapReduceEngine(demand_context_mapper, sum_reducer, mode="row").execute(invoices)
+
+
+@pytest.mark.parametrize("parse_dates", [False, True])
+def test_demand_table_is_typed_and_round_trips(invoices, tmp_path, parse_dates):
+    invoices = invoices.dropna()
+    if parse_dates:
+        invoices = invoices.assign(InvoiceDate=pd.to_datetime(invoices['InvoiceDate']))
+    results = run_demand_analysis_job(invoices)
+    path = tmp_path / "demand_processed.parquet"
+    write_demand_table(results, path)
+
+    df = pd.read_parquet(path)
+    assert list(df.columns) == ["Date", "Country", "Description", "Quantity"]
+    assert df['Date'].dtype.kind == 'M'
+    assert isinstance(df['Country'].dtype, pd.CategoricalDtype)
+    assert isinstance(df['Description'].dtype, pd.CategoricalDtype)
+
+    keys = zip(df['Date'], zip(df['Country'], df['Description']))
+    assert dict(zip(keys, df['Quantity'])) == {
+        (pd.Timestamp(date), context): quantity for (date, context), quantity in results.items()
+    }
+
+
+@pytest.mark.parametrize("mode", ["row", "columnar"])
+def test_parallel_engine_matches_serial_engine(invoices, mode):
+    serial = MapReduceEngine(demand_context_mapper, sum_reducer, mode=mode).execute(invoices)
+    parallel = MapReduceEngine(demand_context_mapper, sum_reducer, mode=mode, workers=3).execute(invoices)
+    combined = MapReduceEngine(
+        demand_context_mapper, sum_reducer, mode=mode, workers=3, combiner=sum_reducer
+    ).execute(invoices)
+
+    assert parallel == serial
+    assert combined == serial
+
+
+def test_streaming_csv_matches_in_memory_job(invoices, tmp_path):
+    invoices = invoices.dropna()
+    path = tmp_path / "invoices.csv"
+    invoices.to_csv(path, index=False)
+
+    in_memory = run_demand_analysis_job(pd.read_csv(path))
+    streamed = run_demand_analysis_job(str(path), chunksize=37)
+
+    assert streamed == in_memory
+
+
+@pytest.mark.parametrize("mode", ["row", "columnar"])
+def test_parallel_streaming_reuses_one_pool(invoices, tmp_path, monkeypatch, mode):
+    import engine as engine_module
+
+    pools = []
+
+    class CountingPool(engine_module.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            pools.append(self)
+
+    monkeypatch.setattr(engine_module, "ProcessPoolExecutor", CountingPool)
+    invoices = invoices.dropna()
+    path = tmp_path / "invoices.csv"
+    invoices.to_csv(path, index=False)
+
+    engine = MapReduceEngine(demand_context_mapper, sum_reducer, mode=mode, workers=2)
+    streamed = engine.execute_stream(pd.read_csv(path, chunksize=37))
+
+    assert streamed == MapReduceEngine(demand_context_mapper, sum_reducer, mode=mode).execute(pd.read_csv(path))
+    assert len(pools) == 1
+
+
+def test_streaming_needs_a_combiner(invoices):
+    def max_reducer(key, values):
+        return max(values)
+
+    engine = MapReduceEngine(demand_context_mapper, max_reducer)
+    with pytest.raises(ValueError):
+        engine.execute_stream([invoices])
+
+
+def test_sum_reducer_is_used_as_combiner():
+    engine = MapReduceEngine(demand_context_mapper, sum_reducer)
+    assert engine.combiner is sum_reducer
+
+    shuffled = engine._shuffle_stage(iter([("a", 1), ("b", 2), ("a", 3), ("a", 4)]))
+    assert shuffled == {"a": [8], "b": [2]}
+
+
+def test_combiner_folds_values_in_row_mode(invoices):
+    calls = []
+
+    def counting_sum(key, values):
+        calls.append(len(values))
+        return sum(values)
+
+    results = MapReduceEngine(demand_context_mapper, sum_reducer, mode="row", combiner=counting_sum).execute(invoices)
+
+    assert results == MapReduceEngine(demand_context_mapper, sum_reducer, mode="columnar").execute(invoices)
+    assert set(calls) == {2}
+
+
+def test_row_mode_reports_stage_metrics(invoices):
+    engine = MapReduceEngine(demand_context_mapper, sum_reducer, mode="row", trace_memory=True)
+    results, metrics = engine.execute(invoices, with_metrics=True)
+
+    assert [stage.name for stage in metrics.stages] == ["map", "shuffle", "reduce"]
+    assert metrics["map"].records_in == len(invoices)
+    assert metrics["map"].records_out == len(invoices)
+    assert metrics["shuffle"].records_in == len(invoices)
+    assert metrics["shuffle"].distinct_keys == len(results)
+    assert metrics["reduce"].records_out == len(results)
+    assert metrics["shuffle"].peak_memory_bytes > 0
+    assert all(stage.seconds >= 0 for stage in metrics.stages)
+    assert engine.metrics is metrics
+
+
+def test_stage_metrics_hooks_in_parallel_and_streaming_jobs(invoices):
+    exported = []
+    # Hooks stay in this process even when the engine is sent to workers
+    hooks = [lambda metrics: exported.append(metrics.as_dict())]
+
+    engine = MapReduceEngine(demand_context_mapper, sum_reducer, workers=2, hooks=hooks)
+    results = engine.execute(invoices)
+    assert [stage['name'] for stage in exported[-1]['stages']] == ["partition", "columnar", "merge"]
+    assert exported[-1]['stages'][-1]['distinct_keys'] == len(results)
+
+    invoices = invoices.dropna()
+    chunks = [invoices.iloc[:200], invoices.iloc[200:]]
+    results, metrics = MapReduceEngine(demand_context_mapper, sum_reducer, hooks=hooks).execute_stream(
+        chunks, with_metrics=True
+    )
+    assert [stage.name for stage in metrics.stages] == ["read", "columnar", "combine", "reduce"]
+    assert metrics["read"].records_out == len(invoices)
+    assert metrics["reduce"].records_out == len(results)
+    assert metrics["read"].peak_memory_bytes is None
+    assert len(exported) == 2
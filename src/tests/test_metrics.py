@@ -0,0 +1,36 @@
+import json
+import logging
+from src.app.log import JsonFormatter
+from src.app.services.metrics import Registry
+
+
+def test_registry_renders_prometheus_text():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests.", ("route",))
+    latency = registry.histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    registry.callback("ratio", "A ratio.", lambda: 0.5)
+
+    requests.inc("/a")
+    requests.inc("/a")
+    for value in (0.05, 0.5, 2.0):
+        latency.observe(value, "/a")
+
+    lines = registry.render().splitlines()
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{route="/a"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_sum{route="/a"} 2.55' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+    assert "ratio 0.5" in lines
+
+
+def test_json_formatter_includes_extra_fields():
+    record = logging.LogRecord("src.app", logging.INFO, __file__, 1, "Forecast request", (), None)
+    record.country = "Australia"
+
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["level"] == "INFO"
+    assert entry["message"] == "Forecast request"
+    assert entry["country"] == "Australia"
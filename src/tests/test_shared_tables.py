@@ -0,0 +1,35 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.app.services.shared_tables import open_shared_tables
+
+
+def build_counted(log_path):
+    with open(log_path, "a") as f:
+        f.write("built\n")
+    return {'table': np.arange(12.0).reshape(3, 4), 'scalar': np.array(np.datetime64('2011-08', 'M'))}
+
+
+def open_in_process(directory, key, log_path):
+    tables = open_shared_tables(directory, key, lambda: build_counted(log_path))
+    return isinstance(tables['table'], np.memmap), tables['table'].sum(), str(tables['scalar'][()])
+
+
+def test_tables_are_built_once_and_mapped_by_every_process(tmp_path):
+    log_path = tmp_path / "builds.log"
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(open_in_process, [tmp_path / "shared"] * 8, ["v1"] * 8, [log_path] * 8))
+
+    assert results == [(True, 66.0, "2011-08")] * 8
+    assert log_path.read_text() == "built\n"
+
+
+def test_new_tables_replace_stale_ones(tmp_path):
+    log_path = tmp_path / "builds.log"
+    open_shared_tables(tmp_path / "shared", "v1", lambda: build_counted(log_path))
+    tables = open_shared_tables(tmp_path / "shared", "v2", lambda: build_counted(log_path))
+
+    assert sorted(p.name for p in (tmp_path / "shared").iterdir() if p.is_dir()) == ["v2"]
+    assert not tables['table'].flags.writeable
+    assert log_path.read_text() == "built\nbuilt\n"